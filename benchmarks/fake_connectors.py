@@ -0,0 +1,84 @@
+import time
+
+from connectors.eltex.eltex import Eltex
+from connectors.juniper.juniper import Juniper
+
+
+def fake_hostname(ip) -> str:
+    return f"bench-{str(ip).replace('.', '-').replace(':', '-')}"
+
+
+class FakeSession:
+    """ Session hooks without a device, opening a session takes 'latency' seconds """
+    latency = 0.0  # simulated session time, seconds
+
+    def open_session(self):
+        time.sleep(self.latency)
+        return object()
+
+    def close_session(self, session):
+        pass
+
+    def is_session_alive(self, session) -> bool:
+        return True
+
+
+class FakeEltex(FakeSession, Eltex):
+    """ Eltex connector returning a synthetic 'show interfaces description' output instead of SSH """
+    interfaces_count = 48
+
+    def read_interfaces(self, session) -> dict:
+        lines = ["Port      Mode          Admin  Link   Description", "-" * 50]
+        for i in range(self.interfaces_count):
+            port_mode = 'Trunk' if i % 4 == 0 else f"Access ({i % 100 + 1})"
+            protocol = 'Down' if i % 5 == 0 else 'Up'
+            lines.append(f"{f'gi1/0/{i + 1}':<10}{port_mode:<14}{'Up':<7}{protocol:<7}port {i + 1}")
+        return {
+            "hostname": fake_hostname(self.ip),
+            "raw_output": '\n'.join(lines),
+        }
+
+
+class FakeJuniper(FakeSession, Juniper):
+    """ Juniper connector returning synthetic 'get-interface-information' data with a LAG and units instead of NETCONF """
+    interfaces_count = 48
+    config_revision = 1  # last commit of all fake Juniper devices, bump it to make them changed for --precheck
+
+    def get_change_indicator(self, session) -> str:
+        return str(self.config_revision)
+
+    def read_interfaces(self, session) -> dict:
+        physical_interfaces = [{
+            'name': [{'data': 'ae0'}],
+            'admin-status': [{'data': 'up'}],
+            'description': [{'data': 'core LAG'}],
+        }]
+        logical_interfaces = list()
+        for i in range(self.interfaces_count):
+            name = f"xe-0/0/{i}"
+            physical_interfaces.append({
+                'name': [{'data': name}],
+                'admin-status': [{'data': 'down' if i % 7 == 0 else 'up'}],
+                'speed': [{'data': '10Gbps'}],
+                'description': [{'data': f"uplink {i}"}],
+                'mtu': [{'data': '1514'}],
+            })
+            if i < 2:  # LAG members
+                logical_interfaces.append({
+                    'name': [{'data': f"{name}.0"}],
+                    'address-family': [{
+                        'address-family-name': [{'data': 'aenet'}],
+                        'ae-bundle-name': [{'data': 'ae0.0'}],
+                    }],
+                })
+            elif i % 4 == 0:  # subinterfaces
+                logical_interfaces.append({
+                    'name': [{'data': f"{name}.100"}],
+                    'description': [{'data': f"vlan 100 on {name}"}],
+                    'address-family': [{'address-family-name': [{'data': 'inet'}]}],
+                })
+        return {
+            "hostname": fake_hostname(self.ip),
+            "physical-interfaces": physical_interfaces,
+            "logical-interfaces": logical_interfaces,
+        }
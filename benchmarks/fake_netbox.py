@@ -0,0 +1,258 @@
+import json
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+API_VERSION = '4.1'
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def _choice(value):
+    """ NetBox returns choice fields as nested dicts """
+    return None if value is None else {'value': value, 'label': str(value)}
+
+
+class FakeNetBox:
+    """
+        In-memory stand-in of NetBox devices and interfaces API
+
+        Supports the requests this tool sends: status, devices and interfaces filters
+        with list values, device site/role/tag/has_primary_ip filters, limit/offset pagination, ordering by last_updated,
+        single and bulk POST/PATCH of interfaces with parent and LAG references.
+        Every request is delayed by 'latency' seconds and counted by phase,
+        interfaces created and updated through the API are counted in 'written'.
+        If throttle_every is set, every N-th request is rejected with 429 and Retry-After.
+    """
+    def __init__(self, latency=0.0, max_page_size=1000, throttle_every=None, retry_after=0.05):
+        self.latency = latency
+        self.max_page_size = max_page_size
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.received = 0
+        self.url = None
+        self.devices = dict()  # id -> device
+        self.device_ids = dict()  # name -> id
+        self.interfaces = dict()  # id -> interface
+        self.device_interfaces = dict()  # device id -> list of interface ids
+        self.requests = Counter()
+        self.written = Counter()  # interfaces, not requests: 'create' and 'update'
+        self.lock = threading.Lock()
+        self.server = None
+
+    def add_device(self, name, primary_ip=None, platform=None, site=None, role=None, tags=()) -> int:
+        device_id = len(self.devices) + 1
+        self.devices[device_id] = {
+            'id': device_id,
+            'url': f"{self.url}/api/dcim/devices/{device_id}/",
+            'display': name,
+            'name': name,
+            'primary_ip': {'address': f"{primary_ip}/32"} if primary_ip else None,
+            'platform': {'name': platform, 'slug': platform} if platform else None,
+            'site': {'name': site, 'slug': site} if site else None,
+            'role': {'name': role, 'slug': role} if role else None,
+            'tags': [{'name': tag, 'slug': tag} for tag in tags],
+            'last_updated': _now(),
+        }
+        self.device_ids[name] = device_id
+        self.device_interfaces[device_id] = list()
+        return device_id
+
+    def _reference(self, device_id, value):
+        """ Nested parent or LAG interface by id, or by name of the device interface when filling the fleet """
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = next(
+                interface_id for interface_id in self.device_interfaces[device_id]
+                if self.interfaces[interface_id]['name'] == value
+            )
+        interface = self.interfaces[int(value)]
+        return {'id': interface['id'], 'url': interface['url'], 'display': interface['name'], 'name': interface['name']}
+
+    def add_interface(self, data) -> dict:
+        """ Create interface from request payload """
+        interface_id = len(self.interfaces) + 1
+        device = self.devices[int(data['device'])]
+        interface = {
+            'id': interface_id,
+            'url': f"{self.url}/api/dcim/interfaces/{interface_id}/",
+            'display': data['name'],
+            'device': {'id': device['id'], 'url': device['url'], 'display': device['name'], 'name': device['name']},
+            'name': data['name'],
+            'type': _choice(data.get('type', 'other')),
+            'enabled': data.get('enabled', True),
+            'mtu': data.get('mtu'),
+            'mode': _choice(data.get('mode')),
+            'description': data.get('description', ''),
+            'parent': self._reference(device['id'], data.get('parent')),
+            'lag': self._reference(device['id'], data.get('lag')),
+            'last_updated': _now(),
+        }
+        self.interfaces[interface_id] = interface
+        self.device_interfaces[device['id']].append(interface_id)
+        return interface
+
+    def update_interface(self, interface_id, data) -> dict:
+        interface = self.interfaces[int(interface_id)]
+        for key, value in data.items():
+            if key == 'id':
+                continue
+            if key in ('type', 'mode'):
+                value = _choice(value)
+            elif key in ('parent', 'lag'):
+                value = self._reference(interface['device']['id'], value)
+            interface[key] = value
+        interface['last_updated'] = _now()
+        return interface
+
+    def count(self, phase):
+        with self.lock:
+            self.requests[phase] += 1
+
+    def throttle(self) -> bool:
+        """ Should the request be rejected with 429 """
+        with self.lock:
+            self.received += 1
+            if self.throttle_every and self.received % self.throttle_every == 0:
+                self.requests['throttled'] += 1
+                return True
+            return False
+
+    def start(self):
+        """ Start HTTP server on a random local port in a background thread """
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _handler(self))
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _page(self, path, objects, query) -> dict:
+        limit = min(int(query.get('limit', [50])[0]) or self.max_page_size, self.max_page_size)
+        offset = int(query.get('offset', [0])[0])
+        results = objects[offset:offset + limit]
+        next_url = None
+        if offset + limit < len(objects):
+            next_query = [(key, value) for key, values in query.items() if key not in ('limit', 'offset') for value in values]
+            next_query += [('limit', limit), ('offset', offset + limit)]
+            next_url = f"{self.url}{path}?{urlencode(next_query)}"
+        return {'count': len(objects), 'next': next_url, 'previous': None, 'results': results}
+
+    @staticmethod
+    def _device_matches(device, query) -> bool:
+        for key in ('site', 'role'):
+            if key in query and (device[key] or {}).get('slug') not in query[key]:
+                return False
+        if 'tag' in query and not {tag['slug'] for tag in device['tags']} & set(query['tag']):
+            return False
+        if query.get('has_primary_ip') == ['True'] and device['primary_ip'] is None:
+            return False
+        return True
+
+    def get(self, path, query):
+        if path == '/api/status/':
+            self.count('status')
+            return {'netbox-version': API_VERSION}
+        if path == '/api/':
+            self.count('status')
+            return {}
+        if path == '/api/dcim/devices/':
+            self.count('devices')
+            ids = [self.device_ids[name] for name in query.get('name', []) if name in self.device_ids]
+            if 'name' not in query:
+                ids = list(self.devices)
+            devices = [self.devices[device_id] for device_id in ids]
+            return self._page(path, [device for device in devices if self._device_matches(device, query)], query)
+        if path == '/api/dcim/interfaces/':
+            self.count('interfaces')
+            interfaces = [
+                self.interfaces[interface_id]
+                for device_id in query.get('device_id', [])
+                for interface_id in self.device_interfaces.get(int(device_id), [])
+            ]
+            if query.get('ordering') == ['-last_updated']:
+                interfaces.sort(key=lambda interface: interface['last_updated'], reverse=True)
+            return self._page(path, interfaces, query)
+        return None
+
+    def post(self, path, data):
+        if path != '/api/dcim/interfaces/':
+            return None
+        self.count('create')
+        with self.lock:
+            items = data if isinstance(data, list) else [data]
+            self.written['create'] += len(items)
+            interfaces = [self.add_interface(item) for item in items]
+        return interfaces if isinstance(data, list) else interfaces[0]
+
+    def patch(self, path, data):
+        if not path.startswith('/api/dcim/interfaces/'):
+            return None
+        self.count('update')
+        with self.lock:
+            if isinstance(data, list):
+                self.written['update'] += len(data)
+                return [self.update_interface(item['id'], item) for item in data]
+            self.written['update'] += 1
+            return self.update_interface(path.rstrip('/').rsplit('/', 1)[1], data)
+
+
+def _handler(netbox):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive like a real NetBox behind nginx
+        disable_nagle_algorithm = True  # headers and body are written separately
+
+        def _reply(self, body, status=200):
+            if body is None:
+                status, body = 404, {'detail': 'Not found.'}
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            if status == 429:
+                self.send_header('Retry-After', str(netbox.retry_after))
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('API-Version', API_VERSION)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length', 0))
+            return json.loads(self.rfile.read(length)) if length else None
+
+        def _throttled(self) -> bool:
+            time.sleep(netbox.latency)
+            if netbox.throttle():
+                self._body()  # read the request to keep the connection usable
+                self._reply({'detail': 'Request was throttled.'}, status=429)
+                return True
+            return False
+
+        def do_GET(self):
+            if self._throttled():
+                return
+            url = urlsplit(self.path)
+            self._reply(netbox.get(url.path, parse_qs(url.query)))
+
+        def do_POST(self):
+            if self._throttled():
+                return
+            self._reply(netbox.post(urlsplit(self.path).path, self._body()), status=201)
+
+        def do_PATCH(self):
+            if self._throttled():
+                return
+            self._reply(netbox.patch(urlsplit(self.path).path, self._body()))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
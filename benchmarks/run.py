@@ -0,0 +1,189 @@
+"""
+    Benchmark of the full netbox-interfaces pipeline against a local fake NetBox
+
+    Runs main() of netbox-interfaces.py (connectors -> normalize -> NetBox diff -> apply)
+    for every fleet size with fake Eltex/Juniper connectors and reports wall time,
+    NetBox requests per phase and peak memory.
+    Interfaces created and updated in the fake NetBox are checked against the differences
+    the fleet was built with, the benchmark exits with an error if they don't match.
+    Use --no-check for runs which intentionally sync only a part of the fleet (filters, shards).
+
+    Usage, from the repository root:
+        python -m benchmarks.run --devices 10 100 1000 --interfaces 48 --latency 0.005
+    Arguments after '--' are passed to netbox-interfaces.py, ex.:
+        python -m benchmarks.run --devices 1000 -- --prefetch --bulk-size 500
+"""
+import argparse
+import contextlib
+import csv
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from ipaddress import ip_address
+from pathlib import Path
+
+from benchmarks.fake_connectors import FakeEltex, FakeJuniper
+from benchmarks.fake_netbox import FakeNetBox
+import connectors.netbox  # noqa: F401, imported lazily by main(), loaded here to keep it out of measured memory
+from connectors.registry import registry
+
+ROOT = Path(__file__).resolve(strict=True).parents[1]
+FAKE_CONNECTORS = {
+    'eltex': FakeEltex,
+    'juniper': FakeJuniper,
+}
+PHASES = ['status', 'devices', 'interfaces', 'create', 'update', 'throttled']
+
+
+def load_tool():
+    """ Import netbox-interfaces.py, its file name isn't a valid module name """
+    spec = importlib.util.spec_from_file_location('netbox_interfaces', ROOT.joinpath('netbox-interfaces.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # --processes pickles functions of the module by name
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_fleet(netbox, options, devices, workdir) -> tuple[Path, Counter]:
+    """
+        Write inventory file and fill fake NetBox with devices
+
+        'existing' part of every device interfaces already exists in NetBox,
+        'changed' part of them has outdated description.
+        Devices are spread over 'sites' sites named site-0, site-1, ...
+        Returns inventory file and numbers of interfaces a sync must create and update
+    """
+    expected = Counter()
+    inventory = workdir.joinpath('inventory.csv')
+    credentials = {'username': 'bench', 'password': 'bench'}
+    with open(inventory, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['ip', 'connector', 'site'])
+        for i in range(devices):
+            ip = ip_address('10.0.0.0') + i + 1
+            connector = options.connectors[i % len(options.connectors)]
+            site = f"site-{i % options.sites}"
+            writer.writerow([str(ip), connector, site])
+            fake = FAKE_CONNECTORS[connector](ip, credentials)
+            normalized = fake.get_interfaces_normalize(fake.get_interfaces())
+            device_id = netbox.add_device(normalized['hostname'], primary_ip=ip, platform=connector, site=site)
+            interfaces = normalized['interfaces']
+            existing = int(len(interfaces) * options.existing)
+            changed = int(existing * options.changed)
+            expected['create'] += len(interfaces) - existing
+            expected['update'] += changed
+            for j, interface in enumerate(interfaces[:existing]):
+                data = dict(interface.to_dict(), device=device_id)
+                if j < changed:
+                    data['description'] = 'outdated'
+                netbox.add_interface(data)
+    return inventory, expected
+
+
+def run(tool, options, devices, tool_argv) -> dict:
+    """ Run main() once for the fleet of 'devices' size """
+    netbox = FakeNetBox(
+        latency=options.latency, max_page_size=options.page_size, throttle_every=options.throttle_every
+    ).start()
+    for fake in FAKE_CONNECTORS.values():
+        fake.interfaces_count = options.interfaces
+        fake.latency = 0.0
+    with tempfile.TemporaryDirectory() as workdir:
+        workdir = Path(workdir)
+        inventory, expected = build_fleet(netbox, options, devices, workdir)
+        settings = workdir.joinpath('settings.ini')
+        settings.write_text(
+            f"[NETBOX]\naddress = {netbox.url}\ntoken = bench\n"
+            "[PLATFORMS]\n" + ''.join(f"{name} = {name}\n" for name in FAKE_CONNECTORS)
+        )
+        for fake in FAKE_CONNECTORS.values():
+            fake.latency = options.device_latency
+        tool.args = tool.parse_args([
+            '--inventory', str(inventory),
+            '--settings', str(settings),
+            '--state', str(workdir.joinpath('state.sqlite')),
+            '--workers', str(options.workers),
+            '--force',
+            *tool_argv,
+        ])
+        netbox.requests.clear()
+        netbox.written.clear()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            tool.main()
+        wall_time = time.perf_counter() - start
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    netbox.stop()
+    return {
+        'devices': devices,
+        'interfaces_per_device': options.interfaces,
+        'wall_time': round(wall_time, 3),
+        'peak_memory_mb': round(peak_memory / 2 ** 20, 1),
+        'requests': {phase: netbox.requests[phase] for phase in PHASES},
+        'expected': dict(expected),
+        'written': dict(netbox.written),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.run',
+        description='Benchmark netbox-interfaces with fake devices and a local fake NetBox',
+    )
+    parser.add_argument('--devices', type=int, nargs='+', default=[10, 100, 1000], help="Fleet sizes")
+    parser.add_argument('--interfaces', type=int, default=48, help="Interfaces per device")
+    parser.add_argument('--connectors', nargs='+', default=['eltex', 'juniper'], choices=list(FAKE_CONNECTORS))
+    parser.add_argument('--sites', type=int, default=1, help="Number of sites devices are spread over")
+    parser.add_argument('--existing', type=float, default=0.5, help="Part of interfaces already in NetBox")
+    parser.add_argument('--changed', type=float, default=0.2, help="Part of existing interfaces with outdated fields")
+    parser.add_argument('--latency', type=float, default=0.0, help="NetBox response delay, seconds")
+    parser.add_argument('--page-size', type=int, default=1000, help="NetBox MAX_PAGE_SIZE")
+    parser.add_argument('--throttle-every', type=int, help="Reject every N-th NetBox request with 429")
+    parser.add_argument('--device-latency', type=float, default=0.0, help="Simulated device session time, seconds")
+    parser.add_argument('--workers', type=int, default=10)
+    parser.add_argument('--json', type=Path, help="Write results to JSON file")
+    parser.add_argument(
+        '--no-check', action='store_true', help="Don't check written interfaces, for partial syncs like --shard-index"
+    )
+    options, tool_argv = parser.parse_known_args()
+    if tool_argv[:1] == ['--']:
+        tool_argv = tool_argv[1:]
+
+    # fake connectors instead of SSH/NETCONF ones, credentials aren't asked
+    for name, fake in FAKE_CONNECTORS.items():
+        registry.register(name, fake)
+    os.environ['NETBOX_INTERFACES_USERNAME'] = 'bench'
+    os.environ['NETBOX_INTERFACES_PASSWORD'] = 'bench'
+    tool = load_tool()
+
+    results = list()
+    mismatches = list()
+    print(f"{'devices':>8} {'wall, s':>9} {'peak, MB':>9} " + ' '.join(f"{phase:>10}" for phase in PHASES))
+    for devices in options.devices:
+        result = run(tool, options, devices, tool_argv)
+        results.append(result)
+        print(
+            f"{devices:>8} {result['wall_time']:>9} {result['peak_memory_mb']:>9} "
+            + ' '.join(f"{result['requests'][phase]:>10}" for phase in PHASES),
+            flush=True,
+        )
+        if not options.no_check and Counter(result['written']) != Counter(result['expected']):
+            mismatches.append(
+                f"{devices} devices: expected {result['expected']} interfaces written, got {result['written']}"
+            )
+    if options.json:
+        options.json.write_text(json.dumps(results, indent=4))
+    if mismatches:
+        sys.exit('Written interfaces mismatch:\n' + '\n'.join(mismatches))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,100 @@
 import abc
+import logging
+
+from connectors.metrics import phase
+
+
+class ConnectorError(Exception):
+    """ Device connection or data collection failed """
 
 
 class BaseConnector:
-    """ Base class for other connectors"""
-    def __init__(self, ip, credentials):
+    """
+        Base class for other connectors
+
+        Connectors implement open_session, read_interfaces and close_session,
+        get_raw_interfaces opens a new session for every call
+        or takes an authenticated one from session_pool if it is set.
+        Raw data is parsed by parse_interfaces after the session is released,
+        so saved raw data can be parsed again without a device.
+        With precheck=True the session first asks get_change_indicator, if it equals
+        last_change_indicator (seen on the last successful sync) interfaces aren't read.
+    """
+    name = None  # connector name in inventory, ex. 'eltex'
+
+    def __init__(
+        self, ip, credentials, timeout=None, metrics=None, session_pool=None, precheck=False, last_change_indicator=None
+    ):
         self.username = credentials['username']
         self.password = credentials['password']
         self.ip = ip
+        self.timeout = timeout  # per-device connect/command timeout in seconds, None - library defaults
+        self.metrics = metrics  # connectors.metrics.Metrics or None
+        self.session_pool = session_pool  # connectors.session_pool.SessionPool or None
+        self.precheck = precheck
+        self.last_change_indicator = last_change_indicator
+        self.change_indicator = None  # indicator got by this run
 
-    @abc.abstractmethod
-    def get_interfaces(self) -> dict:
+    def _phase(self, name):
+        """ Measure device phase, ex. 'connect', if metrics are enabled """
+        return phase(self.metrics, self.ip, name)
+
+    def open_session(self):
+        """ Connect, authenticate and prepare device CLI/NETCONF session """
+        raise NotImplementedError
+
+    def close_session(self, session):
+        raise NotImplementedError
+
+    def is_session_alive(self, session) -> bool:
+        """ Health check of pooled session before reuse """
+        return False
+
+    def read_interfaces(self, session) -> dict:
+        """ Get raw interfaces data using opened session """
+        raise NotImplementedError
+
+    def get_change_indicator(self, session) -> str | None:
+        """ Cheap value which changes when device configuration changes, None - not supported """
+        return None
+
+    def _read_changed_interfaces(self, session) -> dict | None:
+        """ read_interfaces or None if precheck shows that device hasn't changed since the last sync """
+        if self.precheck:
+            with self._phase('precheck'):
+                self.change_indicator = self.get_change_indicator(session)
+            if self.change_indicator is not None and self.change_indicator == self.last_change_indicator:
+                logging.info(f"{self.ip} hasn't changed since the last sync, skipped")
+                return None
+        return self.read_interfaces(session)
+
+    def parse_interfaces(self, data) -> dict:
+        """ Parse raw data from 'read_interfaces', runs after the session is released """
+        return data
+
+    def get_raw_interfaces(self) -> dict | None:
+        """ Get raw interfaces data from device, None if it is skipped by precheck """
+        try:
+            if self.session_pool is not None:
+                with self.session_pool.session(self) as session:
+                    data = self._read_changed_interfaces(session)
+            else:
+                session = self.open_session()
+                try:
+                    data = self._read_changed_interfaces(session)
+                finally:
+                    self.close_session(session)
+                logging.info(f"Connection to {self.ip} successfully closed.")
+        except ConnectorError:
+            raise
+        except Exception as e:
+            raise ConnectorError(f"{self.ip}: {e}") from e
+        return data
+
+    def get_interfaces(self) -> dict | None:
         """ Get interfaces data from device"""
-        pass
+        data = self.get_raw_interfaces()
+        return self.parse_interfaces(data) if data is not None else None
 
     @abc.abstractmethod
     def get_interfaces_normalize(self) -> dict:
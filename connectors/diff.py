@@ -0,0 +1,73 @@
+import logging
+from dataclasses import dataclass, field
+
+from connectors.interface import InterfaceRecord, REFERENCE_FIELDS
+from connectors.netbox_cache import normalize_interface_name
+
+
+@dataclass
+class DeviceChangeset:
+    """ Result of comparing device interfaces with NetBox, used both for preview and apply """
+    hostname: str
+    nb_device: object
+    create: list[InterfaceRecord] = field(default_factory=list)
+    update: list[InterfaceRecord] = field(default_factory=list)  # with 'changed' fields and 'nb_interface'
+    unchanged: list[str] = field(default_factory=list)  # names of interfaces which don't need updating
+
+    def is_empty(self) -> bool:
+        return not self.create and not self.update
+
+    def to_dict(self) -> dict:
+        """ Preview of the changes """
+        return {
+            "hostname": self.hostname,
+            "create_interfaces": [interface.to_dict() for interface in self.create],
+            "update_interfaces": [
+                {'name': interface.nb_interface.name, **interface.changes()} for interface in self.update
+            ],
+        }
+
+
+def netbox_value(nb_values, key):
+    """
+        NetBox interface field value from serialized interface record, dict(record)
+
+        Choice fields like 'mode' and 'type' are {'value': ..., 'label': ...} dicts,
+        parent and LAG interfaces are nested interfaces compared by name.
+        Fields written by this run are plain values, see NB._update_cached_interface.
+    """
+    value = nb_values.get(key)
+    if isinstance(value, dict):
+        return value.get('name') if key in REFERENCE_FIELDS else value.get('value')
+    return value
+
+
+def diff_device(interfaces_normalized, nb_device, nb_interfaces_index) -> DeviceChangeset:
+    """
+        Compare normalized device interfaces with NetBox interfaces in a single pass
+
+        interfaces_normalized looks like:
+        {
+            "hostname": data['hostname'],
+            "interfaces": list()  # of InterfaceRecord
+        }
+        nb_interfaces_index - NetBox interfaces of the device by normalized name
+    """
+    changeset = DeviceChangeset(hostname=interfaces_normalized['hostname'], nb_device=nb_device)
+    for interface in interfaces_normalized['interfaces']:
+        nb_interface = nb_interfaces_index.get(normalize_interface_name(interface.name))
+        if nb_interface is None:  # interface doesn't exist, need to create it
+            changeset.create.append(interface)
+            continue
+        interface.nb_interface = nb_interface
+        nb_values = dict(nb_interface)  # pynetbox keeps nested dicts as records, serialized form has the JSON shape
+        interface.changed = tuple(key for key, value in interface.items() if value != netbox_value(nb_values, key))
+        if interface.changed:
+            changeset.update.append(interface)
+        else:
+            changeset.unchanged.append(nb_interface.name)
+    logging.info(
+        f"{changeset.hostname} interfaces: {len(changeset.create)} to create, "
+        f"{len(changeset.update)} to update, {len(changeset.unchanged)} don't need updating"
+    )
+    return changeset
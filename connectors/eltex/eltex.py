@@ -1,19 +1,27 @@
 import logging
-import sys
-import re
 from pathlib import Path
 
 import netmiko
 
 from connectors.base_connector import BaseConnector
+from connectors.interface import InterfaceRecord
+from connectors.parsers import parse_textfsm, strip_ansi
+
+TEMPLATE_FILE = Path(__file__).resolve(strict=True).parent.joinpath('eltex_show_interfaces_description_template.textfsm')
 
 
 class Eltex(BaseConnector):
     """
         Eltex device connector
+
+        There is no change indicator: 'enabled' is the link state, which changes without configuration changes,
+        and a configuration checksum costs more than 'show interfaces description' itself.
+        Eltex devices are always read, --precheck doesn't skip them.
     """
-    def get_interfaces(self) -> dict:
-        template_file = Path(__file__).resolve(strict=True).parent.joinpath('eltex_show_interfaces_description_template.textfsm')
+    name = 'eltex'
+
+    def open_session(self):
+        """ SSH session with disabled paging, setup commands are sent once per session """
         device = {
             'device_type': 'generic',
             'host': str(self.ip),
@@ -21,32 +29,49 @@ class Eltex(BaseConnector):
             'password': self.password,
             'port': 22,
         }
-
-        def _ansi_escape(s):
-            """Remove the ANSI escape sequences from a string"""
-            ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-            return ansi_escape.sub('', s)
+        if self.timeout is not None:
+            device['conn_timeout'] = self.timeout
+            device['auth_timeout'] = self.timeout
+            device['banner_timeout'] = self.timeout
+            device['read_timeout_override'] = self.timeout
 
         logging.info(f"Connect to {self.ip}")
+        with self._phase('connect'):
+            ssh = netmiko.ConnectHandler(**device)
         try:
-            with netmiko.ConnectHandler(**device) as ssh:
-                hostname = _ansi_escape(ssh.find_prompt().strip()[0:-1])  # get hostname from prompt and clear unprintable characters
+            with self._phase('command'):
                 ssh.send_command('terminal width 0', expect_string=r".+#$")
                 ssh.send_command('terminal datadump', expect_string=r".+#$")
                 ssh.send_command('set cli pagination off', expect_string=r".+#$")
-                output = ssh.send_command(
-                    'show interfaces description',
-                    expect_string=r".+#$",
-                    use_textfsm=True,
-                    textfsm_template=template_file,
-                )
-        except Exception as e:
-            logging.error(e)
-            sys.exit()
-        logging.info(f"Connection to {self.ip} successfully closed.")
+        except Exception:
+            ssh.disconnect()
+            raise
+        return ssh
 
-        result = {
+    def close_session(self, session):
+        session.disconnect()
+
+    def is_session_alive(self, session) -> bool:
+        return session.is_alive()
+
+    def read_interfaces(self, session) -> dict:
+        with self._phase('command'):
+            hostname = strip_ansi(session.find_prompt().strip()[0:-1])  # get hostname from prompt and clear unprintable characters
+            raw_output = session.send_command(
+                'show interfaces description',
+                expect_string=r".+#$",
+            )
+        return {
             "hostname": str(hostname),
+            "raw_output": raw_output,
+        }
+
+    def parse_interfaces(self, data) -> dict:
+        with self._phase('parse'):  # parse after the session is released
+            output = parse_textfsm(data['raw_output'], TEMPLATE_FILE)
+
+        result = {
+            "hostname": data['hostname'],
             "interfaces": output,
         }
 
@@ -88,17 +113,20 @@ class Eltex(BaseConnector):
             return 'other'
         
         for interface in data['interfaces']:
-            interface_data = dict()
-            interface_data['name'] = _convert_vlan_interface_name(interface['interface'])
-            interface_data['mode'] = _convert_interface_mode(interface['port_mode'])
-            interface_data['type'] = _define_interface_type(interface_data['name'])
-            interface_data['enabled'] = True if interface['protocol'].lower() == 'up' else False
-            interface_data['description'] = interface['description'].strip()
-            if interface_data['enabled'] == False and interface_data['description'] == '':
+            name = _convert_vlan_interface_name(interface['interface'])
+            enabled = True if interface['protocol'].lower() == 'up' else False
+            description = interface['description'].strip()
+            if enabled == False and description == '':
                 ### ignore empty interfaces
-                del interface_data
                 continue
-            result['interfaces'].append(interface_data.copy())
-            del interface_data
+            result['interfaces'].append(
+                InterfaceRecord(
+                    name,
+                    mode=_convert_interface_mode(interface['port_mode']),
+                    type=_define_interface_type(name),
+                    enabled=enabled,
+                    description=description,
+                )
+            )
 
         return result
\ No newline at end of file
@@ -0,0 +1,45 @@
+_UNSET = object()
+REFERENCE_FIELDS = ('parent', 'lag')  # names of other interfaces of the same device
+
+
+class InterfaceRecord:
+    """
+        Normalized device interface
+
+        Only fields set by connector are compared with NetBox, fields which aren't set keep empty slots.
+        'parent' and 'lag' are interface names, they are resolved to NetBox ids when written.
+        diff_device sets 'nb_interface' to matching NetBox interface record
+        and 'changed' to names of fields which differ from it.
+    """
+    FIELDS = ('type', 'enabled', 'description', 'mode', 'mtu', *REFERENCE_FIELDS)
+    __slots__ = ('name', *FIELDS, 'changed', 'nb_interface')
+
+    def __init__(self, name, **fields):
+        self.name = name
+        for key, value in fields.items():
+            if key not in self.FIELDS:
+                raise TypeError(f"Unknown interface field '{key}'")
+            setattr(self, key, value)
+        self.changed = None
+        self.nb_interface = None
+
+    def items(self):
+        """ Set fields except name, ex. ('type', 'virtual'), ('enabled', True) """
+        for key in self.FIELDS:
+            value = getattr(self, key, _UNSET)
+            if value is not _UNSET:
+                yield key, value
+
+    def values(self) -> dict:
+        """ All set fields, written to NetBox for a new interface """
+        return dict(self.items())
+
+    def changes(self) -> dict:
+        """ Fields which differ from NetBox, written to NetBox for an existing interface """
+        return {key: getattr(self, key) for key in self.changed or ()}
+
+    def to_dict(self) -> dict:
+        return {'name': self.name, **self.values()}
+
+    def __repr__(self):
+        return f"InterfaceRecord({self.to_dict()!r})"
@@ -1,46 +1,107 @@
 import logging
-import sys
-import re
-from pathlib import Path
 
 from jnpr.junos import Device
 
 from connectors.base_connector import BaseConnector
+from connectors.interface import InterfaceRecord
 
 
 class Juniper(BaseConnector):
     """
         Juniper device connector
+
+        lean=True requests 'show interfaces brief' in XML and keeps only fields used by normalization
+        instead of the full 'show interfaces' tree with statistics in JSON.
+        Logical interfaces (units) are synced as virtual interfaces with their physical interface as parent,
+        LAG member units (family aenet) set 'lag' of the member physical interface instead.
+        Change indicator is the last commit, interfaces appearing without commit (ex. new optics) don't change it.
     """
-    def get_interfaces(self) -> dict:
+    name = 'juniper'
+    PHYSICAL_FIELDS = ('name', 'admin-status', 'speed', 'description', 'mtu')
+    LOGICAL_FIELDS = ('name', 'description')
+    FAMILY_FIELDS = ('address-family-name', 'ae-bundle-name')
+    PHYSICAL_PREFIXES = ('irb', 'lo', 'em', 're', 'ge', 'xe', 'et', 'ae')
+    LOGICAL_PREFIXES = ('irb', 'lo', 'ge', 'xe', 'et', 'ae')
+    INTERNAL_UNITS = ('16384', '16385', '16386', '32767')  # created by Junos itself, ex. lo0.16385, ae0.32767
+
+    def __init__(self, ip, credentials, lean=False, **kwargs):
+        super().__init__(ip, credentials, **kwargs)
+        self.lean = lean
+
+    @staticmethod
+    def _xml_fields(element, fields) -> dict:
+        """ Needed fields of XML element in the same form as JSON RPC output, ex. {'name': [{'data': 'ge-0/0/0'}]} """
+        result = dict()
+        for field in fields:
+            value = element.findtext(field)
+            if value is not None:
+                result[field] = [{'data': value.strip()}]
+        return result
+
+    def _get_interfaces_lean(self, ssh) -> tuple[list, list]:
+        """ Physical and logical interfaces from 'show interfaces brief' """
+        output = ssh.rpc.get_interface_information(brief=True)
+        physical_interfaces = list()
+        logical_interfaces = list()
+        for physical_interface in output.iter('physical-interface'):
+            physical_interfaces.append(self._xml_fields(physical_interface, self.PHYSICAL_FIELDS))
+            for logical_interface in physical_interface.iter('logical-interface'):
+                fields = self._xml_fields(logical_interface, self.LOGICAL_FIELDS)
+                fields['address-family'] = [
+                    self._xml_fields(family, self.FAMILY_FIELDS) for family in logical_interface.iter('address-family')
+                ]
+                logical_interfaces.append(fields)
+        return physical_interfaces, logical_interfaces
+
+    def open_session(self):
         device = {
             'host': str(self.ip),
             'user': self.username,
             'password': self.password,
         }
+        if self.timeout is not None:
+            device['conn_open_timeout'] = self.timeout
         logging.info(f"Connect to {self.ip}")
-        try:
-            with Device(**device) as ssh:
-                hostname = ssh.rpc.get_config(
-                    filter_xml='<system><host-name></host-name></system>',
-                    options={'format':'json'}
-                )['configuration']['system']['host-name']
-                output = ssh.rpc.get_interface_information({'format':'json'})
+        with self._phase('connect'):
+            ssh = Device(**device).open()  # Device context manager would open the session again
+        if self.timeout is not None:
+            ssh.timeout = self.timeout  # RPC timeout
+        return ssh
+
+    def close_session(self, session):
+        session.close()
+
+    def is_session_alive(self, session) -> bool:
+        """ PyEZ 'connected' is only a flag, NETCONF transport is checked too """
+        return session.connected and getattr(session, '_conn', None) is not None and session._conn.connected
+
+    def get_change_indicator(self, session) -> str | None:
+        """ Time, user and client of the last commit from 'show system commit' """
+        commit = session.rpc.get_commit_information().find('commit-history')
+        if commit is None:
+            return None
+        return ' '.join(commit.findtext(field, '').strip() for field in ('date-time', 'user', 'client'))
+
+    def read_interfaces(self, session) -> dict:
+        with self._phase('rpc'):
+            hostname = session.rpc.get_config(
+                filter_xml='<system><host-name></host-name></system>',
+                options={'format':'json'}
+            )['configuration']['system']['host-name']
+            if self.lean:
+                physical_interfaces, logical_interfaces = self._get_interfaces_lean(session)
+            else:
+                output = session.rpc.get_interface_information({'format':'json'})
+                physical_interfaces = output['interface-information'][0]['physical-interface']
 
                 # retrieve logical interfaces
                 logical_interfaces = list()
-                for interface in output['interface-information'][0]['physical-interface']:
-                    if 'logical-interface' in interface:
-                        for logical_interface in interface['logical-interface']:
-                            logical_interfaces.append(logical_interface.copy())
-        except Exception as e:
-            logging.error(e)
-            sys.exit()
-        logging.info(f"Connection to {self.ip} successfully closed.")
+                for interface in physical_interfaces:
+                    logical_interfaces.extend(interface.get('logical-interface', ()))
 
         result = {
             "hostname": str(hostname),
-            "physical-interfaces": output['interface-information'][0]['physical-interface'],
+            "physical-interfaces": physical_interfaces,
             "logical-interfaces": logical_interfaces
         }
         
@@ -80,34 +141,49 @@ class Juniper(BaseConnector):
                 return 'lag'
             return 'other'
 
+        # LAG membership and units in a single pass over logical interfaces
+        lags = dict()  # member physical interface name -> ae interface name
+        units = list()
+        for interface in data['logical-interfaces']:
+            name = interface['name'][0]['data']
+            physical_name, _, unit = name.partition('.')
+            bundle = next((
+                family['ae-bundle-name'][0]['data']
+                for family in interface.get('address-family', ())
+                if 'ae-bundle-name' in family
+                and family.get('address-family-name', [{}])[0].get('data') == 'aenet'
+            ), None)
+            if bundle is not None:
+                lags[physical_name] = bundle.partition('.')[0]
+                continue
+            if not name.startswith(self.LOGICAL_PREFIXES) or not unit or unit in self.INTERNAL_UNITS:
+                continue
+            interface_data = InterfaceRecord(name, type='virtual', parent=physical_name)
+            if 'description' in interface:
+                interface_data.description = interface['description'][0]['data']
+            units.append(interface_data)
+
+        physical_names = set()
         for interface in data['physical-interfaces']:
-            interface_data = dict()
-            if not interface['name'][0]['data'].startswith(('irb', 'lo', 'em', 're', 'ge', 'xe', 'et', 'ae')):
+            if not interface['name'][0]['data'].startswith(self.PHYSICAL_PREFIXES):
                 continue
-            interface_data['name'] = interface['name'][0]['data']
-            interface_data['enabled'] = True if interface['admin-status'][0]['data'] == 'up' else False
+            interface_data = InterfaceRecord(interface['name'][0]['data'])
+            physical_names.add(interface_data.name)
+            interface_data.enabled = True if interface['admin-status'][0]['data'] == 'up' else False
             if 'speed' in interface:
-                interface_data['type'] = _define_interface_type(interface_data['name'], speed=interface['speed'][0]['data'])
+                interface_data.type = _define_interface_type(interface_data.name, speed=interface['speed'][0]['data'])
             else:
-                interface_data['type'] = _define_interface_type(interface_data['name'])  # not all interfaces have speed
+                interface_data.type = _define_interface_type(interface_data.name)  # not all interfaces have speed
             if 'description' in interface:
-                interface_data['description'] = interface['description'][0]['data']
+                interface_data.description = interface['description'][0]['data']
             if 'mtu' in interface:
                 if interface['mtu'][0]['data'].isdigit():  # mtu must contain only digits
-                    interface_data['mtu'] = int(interface['mtu'][0]['data'])
-            result['interfaces'].append(interface_data.copy())
-            del interface_data
-
-### for logical interfaces
-#        for interface in data['logical-interfaces']:
-#            interface_data = dict()
-#            if not interface['name'][0]['data'].startswith(('irb', 'lo', 'ge', 'xe', 'et', 'ae')):
-#                continue
-#            interface_data['name'] = interface['name'][0]['data']
-#            interface_data['type'] = 'virtual'
-#            if 'description' in interface:
-#                interface_data['description'] = interface['description'][0]['data']
-#            result['interfaces'].append(interface_data.copy())
-#            del interface_data
+                    interface_data.mtu = int(interface['mtu'][0]['data'])
+            if interface_data.name in lags:
+                interface_data.lag = lags[interface_data.name]
+            result['interfaces'].append(interface_data)
+
+        # units of skipped physical interfaces have no parent to reference
+        result['interfaces'].extend(unit for unit in units if unit.parent in physical_names)
 
         return result
\ No newline at end of file
@@ -0,0 +1,170 @@
+import cProfile
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlsplit
+
+RUN = 'run'  # device key for phases which aren't related to a single device
+PROMETHEUS_PREFIX = 'netbox_interfaces'
+
+
+def _endpoint(url) -> str:
+    """ Request path without query and object ids, ex. '/api/dcim/interfaces/{id}/' """
+    return re.sub(r'/\d+/', '/{id}/', urlsplit(url).path)
+
+
+def _labels(**labels) -> str:
+    values = ','.join(f'{key}="{str(value)}"' for key, value in labels.items())
+    return f"{{{values}}}"
+
+
+class Metrics:
+    """
+        Thread-safe run instrumentation
+
+        Collects per-device phase timings (collection, parsing, normalization, diff)
+        and NetBox request counts and latencies by method and endpoint.
+        Devices are recorded by IP during collection and by hostname in NetBox phases,
+        set_hostname joins them in the report.
+        If profile_device is set, phases of this device (IP or hostname) run under cProfile.
+    """
+    def __init__(self, profile_device=None):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.phases = defaultdict(lambda: defaultdict(float))
+        self.hostnames = dict()
+        self.requests = dict()
+        self.profile_device = profile_device
+        self.profiler = cProfile.Profile() if profile_device else None
+
+    def reset(self):
+        """ Start a new report, used before every run of a long-running process """
+        with self.lock:
+            self.started = time.time()
+            self.phases.clear()
+            self.hostnames.clear()
+            self.requests.clear()
+
+    @contextmanager
+    def phase(self, device, name):
+        """ Measure phase duration, repeated phases of the same device are summed """
+        profile = self.profiler is not None and str(device) == self.profile_device
+        start = time.perf_counter()
+        if profile:
+            self.profiler.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                self.profiler.disable()
+            self.add_phase(device, name, time.perf_counter() - start)
+
+    def add_phase(self, device, name, seconds):
+        with self.lock:
+            self.phases[str(device)][name] += seconds
+
+    def add_device_phases(self, devices):
+        """ Merge device_phases() of another process """
+        with self.lock:
+            for device, phases in devices.items():
+                for name, seconds in phases.items():
+                    self.phases[device][name] += seconds
+
+    def set_hostname(self, ip, hostname):
+        with self.lock:
+            self.hostnames[str(ip)] = hostname
+            if self.profile_device == str(ip):
+                self.profile_device = hostname  # profile NetBox phases of this device too
+
+    def add_request(self, method, url, status, seconds):
+        key = (method, _endpoint(url))
+        with self.lock:
+            stats = self.requests.setdefault(key, {'count': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            stats['count'] += 1
+            stats['errors'] += 1 if status is None or status >= 400 else 0
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+
+    def instrument_session(self, session):
+        """ Count requests of pynetbox requests.Session """
+        def _hook(response, *args, **kwargs):
+            self.add_request(
+                response.request.method, response.url, response.status_code, response.elapsed.total_seconds()
+            )
+        session.hooks['response'].append(_hook)
+
+    def device_phases(self) -> dict:
+        """ Phases by hostname, devices which weren't collected stay by IP """
+        devices = defaultdict(dict)
+        with self.lock:
+            for device, phases in self.phases.items():
+                if device == RUN:
+                    continue
+                for name, seconds in phases.items():
+                    devices[self.hostnames.get(device, device)][name] = round(seconds, 6)
+        return dict(devices)
+
+    def report(self) -> dict:
+        with self.lock:
+            requests = [
+                {'method': method, 'endpoint': endpoint, **stats}
+                for (method, endpoint), stats in sorted(self.requests.items())
+            ]
+            run = {name: round(seconds, 6) for name, seconds in self.phases[RUN].items()}
+        return {
+            'started': self.started,
+            'duration': round(time.time() - self.started, 6),
+            'run': run,
+            'devices': self.device_phases(),
+            'netbox_requests': requests,
+        }
+
+    def prometheus(self) -> str:
+        """ Report in Prometheus textfile collector format """
+        report = self.report()
+        lines = [
+            f"# TYPE {PROMETHEUS_PREFIX}_duration_seconds gauge",
+            f"{PROMETHEUS_PREFIX}_duration_seconds {report['duration']}",
+            f"# TYPE {PROMETHEUS_PREFIX}_run_phase_seconds gauge",
+        ]
+        lines += [
+            f"{PROMETHEUS_PREFIX}_run_phase_seconds{_labels(phase=name)} {seconds}"
+            for name, seconds in report['run'].items()
+        ]
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_device_phase_seconds gauge")
+        lines += [
+            f"{PROMETHEUS_PREFIX}_device_phase_seconds{_labels(device=device, phase=name)} {seconds}"
+            for device, phases in report['devices'].items() for name, seconds in phases.items()
+        ]
+        for metric, key in (
+            ('netbox_requests_total', 'count'),
+            ('netbox_request_errors_total', 'errors'),
+            ('netbox_request_seconds_sum', 'seconds'),
+            ('netbox_request_seconds_max', 'max_seconds'),
+        ):
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{metric} {'gauge' if key == 'max_seconds' else 'counter'}")
+            lines += [
+                f"{PROMETHEUS_PREFIX}_{metric}{_labels(method=request['method'], endpoint=request['endpoint'])} "
+                f"{round(request[key], 6)}"
+                for request in report['netbox_requests']
+            ]
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """ Write report to JSON file or Prometheus textfile if file suffix is '.prom' """
+        if path.suffix == '.prom':
+            path.write_text(self.prometheus())
+        else:
+            path.write_text(json.dumps(self.report(), indent=4))
+
+    def dump_profile(self, path):
+        if self.profiler is not None:
+            self.profiler.dump_stats(path)
+
+
+def phase(metrics, device, name):
+    """ Metrics.phase which does nothing if metrics isn't set """
+    return metrics.phase(device, name) if metrics is not None else nullcontext()
@@ -1,29 +1,83 @@
+import asyncio
 import logging
 import sys
+from contextlib import contextmanager
 from pathlib import Path
+from ipaddress import ip_interface
 import configparser
 
 import requests.exceptions
 import urllib3
 import pynetbox
 
+from connectors.interface import REFERENCE_FIELDS
+from connectors.netbox_cache import NetBoxCache, normalize_interface_name
+from connectors.diff import DeviceChangeset, diff_device
+from connectors.netbox_async import AsyncNetBoxClient, REQUEST_ERRORS, DEFAULT_CONCURRENCY, aiohttp
+from connectors.netbox_scheduler import RequestScheduler, ScheduledSession, DEFAULT_RETRIES
+
+PREFETCH_BATCH_SIZE = 100  # names or ids in one filter request, keeps URL length reasonable
+PAGE_SIZE = 1000  # NetBox MAX_PAGE_SIZE default
+
+
+class DeviceNotFoundError(LookupError):
+    """ Device hostname isn't found in NetBox """
+
+
+def _chunks(items, size):
+    """ Split list into lists of 'size' length """
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
 
 class NB:
-    """ Main Netbox class"""
-    def __init__(self, insecure=False):
+    """
+        Main Netbox class
+
+        backend='sync' sends requests one by one through pynetbox,
+        backend='async' sends bulk lookups and writes concurrently through AsyncNetBoxClient,
+        at most 'concurrency' requests at the same time.
+        Requests of both backends go through one RequestScheduler:
+        'rate' requests per second at most, retries of 429/5xx with backoff, adaptive concurrency.
+        device_filters - NetBox device filters added to every device query, ex. {'site': ['msk-1']},
+        devices which don't match them are out of scope.
+        Async calls inside async_session share one event loop and one HTTP session.
+        Without aiohttp installed backend='async' falls back to 'sync' with a warning.
+    """
+    def __init__(
+        self, insecure=False, backend='sync', concurrency=DEFAULT_CONCURRENCY, settings=None, metrics=None,
+        rate=None, retries=DEFAULT_RETRIES, device_filters=None,
+    ):
         config = configparser.ConfigParser()
         config.read(
-            Path(__file__).resolve(strict=True).parents[1].joinpath('settings.ini')
+            settings or Path(__file__).resolve(strict=True).parents[1].joinpath('settings.ini')
         )
         self.address = config['NETBOX']['address']
         self.token = config['NETBOX']['token']
+        self.platforms = dict(config['PLATFORMS']) if config.has_section('PLATFORMS') else dict()
         self.nb = pynetbox.api(
             self.address,
             token=self.token,
         )
+        self.scheduler = RequestScheduler(rate=rate, retries=retries, max_concurrency=concurrency)
+        self.nb.http_session = ScheduledSession(self.scheduler)
         if insecure:
             self.nb.http_session.verify = False
             urllib3.disable_warnings()
+        self.insecure = insecure
+        if backend == 'async' and aiohttp is None:
+            logging.warning("aiohttp isn't installed, async NetBox backend falls back to sync, "
+                            "install it with 'pip install aiohttp'")
+            backend = 'sync'
+        self.backend = backend
+        self.concurrency = concurrency
+        self.metrics = metrics
+        self.device_filters = device_filters or dict()
+        if metrics is not None:
+            metrics.instrument_session(self.nb.http_session)
+        self.cache = NetBoxCache()
+        self._loop = None  # event loop and client of async_session
+        self._client = None
 
         try:
             self.nb.status()
@@ -31,172 +85,419 @@ class NB:
             logging.error(e)
             sys.exit()
 
+    def _find_device(self, hostname):
+        """ NetBox device by hostname matching device filters or None, device is requested once per run """
+        if not self.cache.has_device(hostname):
+            self.cache.set_device(hostname, self.nb.dcim.devices.get(name=hostname, **self.device_filters))
+        return self.cache.get_device(hostname)
+
+    def in_scope(self, hostname) -> bool:
+        """ Device exists in NetBox and matches device filters, always True without filters """
+        return not self.device_filters or self._find_device(hostname) is not None
+
     def get_netbox_device(self, hostname):
-        """ Get NetBox device by hostname """
-        device = self.nb.dcim.devices.get(name=hostname)
+        """ Get NetBox device by hostname, device is requested once per run """
+        device = self._find_device(hostname)
         if device is None:
-            logging.error(f"Can't find {hostname} in NetBox devices")
-            sys.exit()
+            raise DeviceNotFoundError(f"Can't find {hostname} in NetBox devices")
         return device
 
     def get_netbox_interfaces(self, device):
-        """ Get NetBox interfaces by device id """
-        interfaces = list(self.nb.dcim.interfaces.filter(device_id=device.id))
-        return interfaces
-    
-    def _is_this_interfaces_in_netbox(self, interface, nb_interfaces):
-        """ Return id if interface exists in NetBox """
-        interface_id = next(
-            (nb_interface for nb_interface in nb_interfaces
-             if nb_interface.name.lower().replace(" ","") == interface['name'].lower().replace(" ","")),
-            None
+        """ Get NetBox interfaces by device id, interfaces are requested once per run """
+        if not self.cache.has_interfaces(device.id):
+            self.cache.set_interfaces(device.id, self.nb.dcim.interfaces.filter(device_id=device.id))
+        return self.cache.get_interfaces(device.id)
+
+    def get_netbox_interfaces_index(self, device) -> dict:
+        """ Get NetBox interfaces by device id, indexed by normalized interface name """
+        self.get_netbox_interfaces(device)
+        return self.cache.get_interfaces_index(device.id)
+
+    def get_interfaces_marker(self, device) -> str:
+        """
+            Cheap NetBox-side change marker of device interfaces: count and latest last_updated
+
+            Uses cached interfaces if they are loaded (prefetch, diff, written interfaces
+            keep last_updated of NetBox responses), otherwise asks NetBox
+            for a single interface ordered by last_updated.
+        """
+        if self.cache.has_interfaces(device.id):
+            interfaces = self.cache.get_interfaces(device.id)
+            last_updated = max((str(interface.last_updated) for interface in interfaces), default=None)
+            return f"{len(interfaces)}:{last_updated}"
+        interfaces = self.nb.dcim.interfaces.filter(device_id=device.id, ordering='-last_updated', limit=1, offset=0)
+        latest = next(interfaces, None)
+        last_updated = str(latest.last_updated) if latest is not None else None
+        return f"{len(interfaces)}:{last_updated}"
+
+    def _record(self, endpoint, values):
+        """ Wrap raw API object into pynetbox record, the same way pynetbox does it """
+        return endpoint.return_obj(values, self.nb, endpoint)
+
+    def _async_client(self) -> AsyncNetBoxClient:
+        return AsyncNetBoxClient(
+            self.address,
+            self.token,
+            concurrency=self.concurrency,
+            verify=not self.insecure,
+            page_size=PAGE_SIZE,
+            metrics=self.metrics,
+            scheduler=self.scheduler,
         )
-        return interface_id
-    
-    def not_update_identic_interface_fields(self, data):
-        """ 
-        Remove identic fields in normalized data from devices 
-        
-        Function for single device normalized interfaces, input data looks like:
-        {
-            "hostname": data['hostname'],
-            "interfaces": list()
-        }
-        
+
+    @contextmanager
+    def async_session(self):
+        """ Keep one event loop and one AsyncNetBoxClient for all async calls inside, ex. the whole --stream run """
+        if self.backend != 'async' or self._loop is not None:
+            yield
+            return
+        loop = asyncio.new_event_loop()
+        client = self._async_client()
+        try:
+            loop.run_until_complete(client.__aenter__())
+            self._loop, self._client = loop, client
+            try:
+                yield
+            finally:
+                self._loop = self._client = None
+                loop.run_until_complete(client.__aexit__(None, None, None))
+        finally:
+            loop.close()
+
+    def _run_async(self, function, *args):
+        """ Run function(client, *args) coroutine with the client of async_session or a new one """
+        if self._loop is not None:
+            return self._loop.run_until_complete(function(self._client, *args))
+
+        async def _with_client():
+            async with self._async_client() as client:
+                return await function(client, *args)
+
+        return asyncio.run(_with_client())
+
+    def get_inventory(self, hostname_regex=None) -> list[dict]:
+        """
+            Inventory of NetBox devices with primary IP matching device filters and hostname_regex
+
+            Connector is chosen by device platform slug from [PLATFORMS] settings section,
+            ex. 'junos = juniper', devices of other platforms are skipped.
+            Found devices are cached, so they aren't requested again during the run.
+        """
+        inventory = list()
+        for device in self.nb.dcim.devices.filter(has_primary_ip=True, limit=PAGE_SIZE, **self.device_filters):
+            if hostname_regex is not None and not hostname_regex.search(device.name):
+                continue
+            platform = device.platform.slug if device.platform else None
+            if platform not in self.platforms:
+                logging.info(f"{device.name}: platform '{platform}' has no connector in [PLATFORMS] settings, skipped")
+                continue
+            self.cache.set_device(device.name, device)
+            inventory.append({
+                'ip': ip_interface(device.primary_ip.address).ip,
+                'connector': self.platforms[platform].lower().strip(),
+                'site': device.site.slug if device.site else '',
+                'hostname': device.name,
+            })
+        logging.info(f"{len(inventory)} devices in NetBox inventory")
+        return inventory
+
+    def prefetch(self, hostnames, batch_size=PREFETCH_BATCH_SIZE):
+        """
+            Load devices and their interfaces into cache with a few bulk requests
+
+            Devices are resolved by 'name' filter with a list of hostnames,
+            interfaces are requested by 'device_id' filter with a list of device ids.
+            Hostnames missing in NetBox are cached too, so they aren't requested again.
+        """
+        hostnames = [hostname for hostname in dict.fromkeys(hostnames) if not self.cache.has_device(hostname)]
+        if self.backend == 'async':
+            self._run_async(self._async_prefetch, hostnames, batch_size)
+            return
+        for batch in _chunks(hostnames, batch_size):
+            for device in self.nb.dcim.devices.filter(name=batch, limit=PAGE_SIZE, **self.device_filters):
+                self.cache.set_device(device.name, device)
+        self._cache_missing_devices(hostnames)
+
+        device_ids = self._devices_without_interfaces()
+        for batch in _chunks(device_ids, batch_size):
+            self._cache_interfaces(batch, self.nb.dcim.interfaces.filter(device_id=batch, limit=PAGE_SIZE))
+        logging.info(f"Prefetched interfaces of {len(device_ids)} devices from NetBox")
+
+    async def _async_prefetch(self, client, hostnames, batch_size):
+        """ The same as prefetch, but batches are requested concurrently """
+        pages = await asyncio.gather(*(
+            client.get_all('dcim/devices/', {'name': batch, **self.device_filters})
+            for batch in _chunks(hostnames, batch_size)
+        ))
+        for devices in pages:
+            for values in devices:
+                device = self._record(self.nb.dcim.devices, values)
+                self.cache.set_device(device.name, device)
+        self._cache_missing_devices(hostnames)
+
+        device_ids = self._devices_without_interfaces()
+        batches = list(_chunks(device_ids, batch_size))
+        pages = await asyncio.gather(*(
+            client.get_all('dcim/interfaces/', {'device_id': batch})
+            for batch in batches
+        ))
+        for batch, interfaces in zip(batches, pages):
+            self._cache_interfaces(
+                batch, (self._record(self.nb.dcim.interfaces, values) for values in interfaces)
+            )
+        logging.info(f"Prefetched interfaces of {len(device_ids)} devices from NetBox")
+
+    def _cache_missing_devices(self, hostnames):
+        """ Remember hostnames which weren't found by prefetch """
+        for hostname in hostnames:
+            if not self.cache.has_device(hostname):
+                self.cache.set_device(hostname, None)
+        logging.info(f"Prefetched {len(hostnames)} devices from NetBox")
+
+    def _devices_without_interfaces(self) -> list[int]:
+        return [
+            device.id for device in self.cache.devices.values()
+            if device is not None and not self.cache.has_interfaces(device.id)
+        ]
+
+    def _cache_interfaces(self, device_ids, interfaces):
+        """ Split interfaces of several devices by device and put them into cache """
+        devices_interfaces = {device_id: list() for device_id in device_ids}
+        for interface in interfaces:
+            devices_interfaces[interface.device.id].append(interface)
+        for device_id, device_interfaces in devices_interfaces.items():
+            self.cache.set_interfaces(device_id, device_interfaces)
+
+    def diff(self, interfaces_normalized) -> DeviceChangeset:
+        """ Compare normalized device interfaces with NetBox, see diff.diff_device """
+        nb_device = self.get_netbox_device(interfaces_normalized['hostname'])
+        return diff_device(interfaces_normalized, nb_device, self.get_netbox_interfaces_index(nb_device))
+
+    @staticmethod
+    def _interface_error(changeset, change, action, error) -> dict:
+        logging.warning(f"{error} - {changeset.hostname} {change.name}")
+        return {"hostname": changeset.hostname, "name": change.name, "action": action, "error": str(error)}
+
+    @staticmethod
+    def _write_values(change) -> dict:
+        """ All fields of a new interface, changed fields of an existing one """
+        return change.changes() if change.nb_interface is not None else change.values()
+
+    def _reference_ids(self, changeset, values) -> dict:
+        """ Replace parent and LAG interface names with their NetBox ids from the device interfaces index """
+        if not any(values.get(key) for key in REFERENCE_FIELDS):
+            return values
+        index = self.get_netbox_interfaces_index(changeset.nb_device)
+        values = dict(values)
+        for key in REFERENCE_FIELDS:
+            if values.get(key):
+                interface = index.get(normalize_interface_name(values[key]))
+                if interface is None:
+                    raise LookupError(f"{key} interface {values[key]} isn't in NetBox")
+                values[key] = interface.id
+        return values
+
+    def _create_payload(self, changeset, change) -> dict:
+        return {'name': change.name, 'device': changeset.nb_device.id, **self._reference_ids(changeset, change.values())}
+
+    def _update_payload(self, changeset, change) -> dict:
+        return {'id': change.nb_interface.id, **self._reference_ids(changeset, change.changes())}
+
+    @staticmethod
+    def _write_levels(items) -> list[list]:
         """
-        nb_device = self.get_netbox_device(data['hostname'])
-        nb_interfaces = self.get_netbox_interfaces(nb_device)
-
-        for interface in data['interfaces']:
-            nb_interface = self._is_this_interfaces_in_netbox(interface, nb_interfaces)
-            if nb_interface is not None:  # check only existed interfaces in netbox
-                keys_do_not_need_updating = list()
-                for key, value in interface.items():
-                    # iterate over device interface keys/values 
-                    # and compare with NetBox interface values
-                    if key == 'name':
-                        interface['name'] = nb_interface['name']
-                        continue
-                    if isinstance(nb_interface[key], dict):  # because some fields in NetBox have nested fields
-                        if value == nb_interface[key]['value']:
-                            logging.info(
-                                f"{data['hostname']} {interface['name']} {key} doesn't need updating"
-                            )
-                            keys_do_not_need_updating.append(key)
-                    else:
-                        if value == nb_interface[key]:
-                            logging.info(
-                                f"{data['hostname']} {interface['name']} {key} doesn't need updating"
-                            )
-                            keys_do_not_need_updating.append(key)
-                for key in keys_do_not_need_updating:
-                    del interface[key]
-                del keys_do_not_need_updating
-
-        interfaces_do_not_need_updating = list()
-        for i, interface in enumerate(data['interfaces']):
-            # iterate again to clear interfaces that don't need updating
-            if len(interface) == 1:
-                logging.info(
-                    f"{data['hostname']} interface {interface['name']} doesn't need updating"
-                )
-                interfaces_do_not_need_updating.append(i)
-        data['interfaces'] = [i for j, i in enumerate(data['interfaces']) if j not in interfaces_do_not_need_updating]
-        return data
-
-    def not_update_identic_devices(self, data):
-        """ 
-            Remove devices from normalized list 
-            if device doesn't need to create or update interfaces
+            Split (changeset, interface) items into levels written one after another,
+            so a parent or LAG interface written in this run is in NetBox before interfaces referencing it
         """
-        devices_do_not_need_updating = list()
-        for i, device in enumerate(data):
-            if len(device['interfaces']) == 0:
-                logging.info(
-                    f"{device['hostname']} doesn't need updating"
-                )
-                devices_do_not_need_updating.append(i)
-        data = [i for j, i in enumerate(data) if j not in devices_do_not_need_updating]
-        return data
-    
-    def show_diff(self, data):
-        """ Show diff between data from devices and NetBox """
+        written = {
+            (id(changeset), normalize_interface_name(change.name)): change for changeset, change in items
+        }
+        levels = dict()
+
+        def _level(changeset, change, seen):
+            key = (id(changeset), normalize_interface_name(change.name))
+            if key not in levels:
+                level = 0
+                values = NB._write_values(change)
+                for field in REFERENCE_FIELDS:
+                    target = written.get((id(changeset), normalize_interface_name(values.get(field) or '')))
+                    if target is not None and target is not change and key not in seen:
+                        level = max(level, _level(changeset, target, seen | {key}) + 1)
+                levels[key] = level
+            return levels[key]
+
         result = list()
+        for changeset, change in items:
+            level = _level(changeset, change, frozenset())
+            while len(result) <= level:
+                result.append(list())
+            result[level].append((changeset, change))
+        return result
 
-        def _add_device_to_result(hostname, result) -> list[dict]:
-            """ Create new device in result and return updated result """
-            device_in_result = next((result_device for result_device in result if result_device['hostname'] == hostname), None)  # find device in result
-            if device_in_result is None:  # new device in result
-                result_dict = {
-                    "hostname": device['hostname'],
-                    "create_interfaces": [],
-                    "update_interfaces": [],
-                }
-                result.append(result_dict.copy())
-                del result_dict
-                return result
-            else:  # don't need to add new device in result
-                return result
-            
-        def _get_device_index_from_result(hostname, result) -> int:
-            """ Return device element index from result """
+    def _resolvable(self, items) -> tuple[list, list[dict]]:
+        """ Items whose parent and LAG interfaces are in NetBox and errors of the others """
+        resolvable = list()
+        errors = list()
+        for changeset, change in items:
             try:
-                index = next(i for i, result_device in enumerate(result) if result_device['hostname'] == hostname)
-            except Exception as e:
-                logging.error(f"Can't find device index in diff result {e}")
-                sys.exit()
-            return index
-
-        for device in data:
-            hostname = device['hostname']
-            nb_device = self.nb.dcim.devices.get(name=hostname)
-            nb_interfaces = self.get_netbox_interfaces(nb_device)
-            for interface in device['interfaces']:
-                nb_interface = self._is_this_interfaces_in_netbox(interface, nb_interfaces)
-                if nb_interface is None:  # interface doesn't exist, need to create it
-                    result = _add_device_to_result(hostname, result)
-                    device_index = _get_device_index_from_result(hostname, result)
-                    result[device_index]['create_interfaces'].append(interface.copy())
-                else:  # interface exist, need to update it
-                    result = _add_device_to_result(hostname, result)
-                    device_index = _get_device_index_from_result(hostname, result)
-                    result[device_index]['update_interfaces'].append(interface.copy())
-        
-        return result
+                self._reference_ids(changeset, self._write_values(change))
+            except LookupError as e:
+                errors.append(self._interface_error(
+                    changeset, change, 'update' if change.nb_interface is not None else 'create', e
+                ))
+                continue
+            resolvable.append((changeset, change))
+        return resolvable, errors
+
+    @staticmethod
+    def _update_cached_interface(change, response):
+        """
+            Apply written fields to cached record, the same way pynetbox Record.update does,
+            and last_updated from NetBox response, so interfaces marker is computed without asking NetBox again
+        """
+        for key, value in change.changes().items():
+            setattr(change.nb_interface, key, value)
+        change.nb_interface.last_updated = response['last_updated']
+
+    def _create_interface(self, changeset, change):
+        """ Create single interface, return error dict if NetBox rejected it """
+        try:
+            logging.info(f"create {changeset.hostname} {change.name}")
+            new_interface = self.nb.dcim.interfaces.create(**self._create_payload(changeset, change))
+            self.cache.add_interface(changeset.nb_device.id, new_interface)
+        except pynetbox.core.query.RequestError as e:
+            return self._interface_error(changeset, change, 'create', e)
+        return None
+
+    def _update_interface(self, changeset, change):
+        """ Update single interface, return error dict if NetBox rejected it """
+        try:
+            logging.info(f"update {changeset.hostname} {change.name}")
+            updated = self.nb.dcim.interfaces.update([self._update_payload(changeset, change)])
+            self._update_cached_interface(change, updated[0])
+        except pynetbox.core.query.RequestError as e:
+            return self._interface_error(changeset, change, 'update', e)
+        return None
+
+    def _bulk_create_interfaces(self, chunk) -> list[dict]:
+        """ Create interfaces with one list request, retry one by one if the request failed """
+        try:
+            logging.info(f"bulk create {len(chunk)} interfaces")
+            new_interfaces = self.nb.dcim.interfaces.create(
+                [self._create_payload(changeset, change) for changeset, change in chunk]
+            )
+        except pynetbox.core.query.RequestError as e:
+            logging.warning(f"{e} - bulk create failed, retry {len(chunk)} interfaces one by one")
+            errors = [self._create_interface(*item) for item in chunk]
+            return [error for error in errors if error is not None]
+        for (changeset, _), new_interface in zip(chunk, new_interfaces):
+            self.cache.add_interface(changeset.nb_device.id, new_interface)
+        return list()
+
+    def _bulk_update_interfaces(self, chunk) -> list[dict]:
+        """ Update interfaces with one list request, retry one by one if the request failed """
+        try:
+            logging.info(f"bulk update {len(chunk)} interfaces")
+            updated = self.nb.dcim.interfaces.update(
+                [self._update_payload(changeset, change) for changeset, change in chunk]
+            )
+        except pynetbox.core.query.RequestError as e:
+            logging.warning(f"{e} - bulk update failed, retry {len(chunk)} interfaces one by one")
+            errors = [self._update_interface(*item) for item in chunk]
+            return [error for error in errors if error is not None]
+        for (_, change), response in zip(chunk, updated):  # keep cached records consistent
+            self._update_cached_interface(change, response)
+        return list()
+
+    async def _async_write_interfaces(self, client, levels, bulk_size) -> list[dict]:
+        """ Send create and update chunks of every level concurrently, levels one after another """
+        errors = list()
+        for level in levels:
+            creates, updates, unresolved = self._split_level(level)
+            errors.extend(unresolved)
+            results = await asyncio.gather(
+                *(self._async_write_chunk(client, 'create', chunk) for chunk in _chunks(creates, bulk_size)),
+                *(self._async_write_chunk(client, 'update', chunk) for chunk in _chunks(updates, bulk_size)),
+            )
+            errors.extend(error for chunk_errors in results for error in chunk_errors)
+        return errors
+
+    async def _async_write_chunk(self, client, action, chunk) -> list[dict]:
+        """ Create or update interfaces with one list request, retry one by one if the request failed """
+        if action == 'create':
+            method = 'POST'
+            payload = [self._create_payload(changeset, change) for changeset, change in chunk]
+        else:
+            method = 'PATCH'
+            payload = [self._update_payload(changeset, change) for changeset, change in chunk]
+        try:
+            logging.info(f"{action} {len(chunk)} interfaces")
+            response = await client.request(method, 'dcim/interfaces/', json=payload)
+        except REQUEST_ERRORS as e:
+            if len(chunk) == 1:
+                return [self._interface_error(*chunk[0], action, e)]
+            logging.warning(f"{e} - bulk {action} failed, retry {len(chunk)} interfaces one by one")
+            results = await asyncio.gather(*(self._async_write_chunk(client, action, [item]) for item in chunk))
+            return [error for errors in results for error in errors]
+        if action == 'create':
+            for (changeset, _), values in zip(chunk, response):
+                self.cache.add_interface(changeset.nb_device.id, self._record(self.nb.dcim.interfaces, values))
+        else:
+            for (_, change), values in zip(chunk, response):
+                self._update_cached_interface(change, values)
+        return list()
+
+    def add_interfaces(self, changesets, bulk_size=None) -> list[dict]:
+        """
+            Apply device changesets to NetBox
+
+            Without bulk_size every interface is sent with its own request.
+            With bulk_size interfaces are sent to the interfaces list endpoint in chunks,
+            a failed chunk is retried item by item, so one bad interface doesn't fail the others.
+            Async backend sends requests (chunks or single interfaces) concurrently.
+            Interfaces referencing parent or LAG interfaces of the same run are written after them,
+            they fail if the referenced interface couldn't be written.
+            Return list of per-interface errors
+        """
+        levels = self._write_levels(
+            [(changeset, change) for changeset in changesets for change in changeset.create + changeset.update]
+        )
+        if self.backend == 'async':
+            return self._run_async(self._async_write_interfaces, levels, bulk_size or 1)
+        errors = list()
+        for level in levels:
+            creates, updates, unresolved = self._split_level(level)
+            errors.extend(unresolved)
+            if bulk_size is None:
+                for item in creates:
+                    errors.append(self._create_interface(*item))
+                for item in updates:
+                    errors.append(self._update_interface(*item))
+                continue
+            for chunk in _chunks(creates, bulk_size):
+                errors.extend(self._bulk_create_interfaces(chunk))
+            for chunk in _chunks(updates, bulk_size):
+                errors.extend(self._bulk_update_interfaces(chunk))
+        return [error for error in errors if error is not None]
 
+    def _split_level(self, level) -> tuple[list, list, list[dict]]:
+        """ Creates and updates of the level which can be written and errors of unresolved ones """
+        items, errors = self._resolvable(level)
+        creates = [(changeset, change) for changeset, change in items if change.nb_interface is None]
+        updates = [(changeset, change) for changeset, change in items if change.nb_interface is not None]
+        return creates, updates, errors
 
-    def add_interfaces(self, data):
-        """ Add interfaces to NetBox """
-        for device in data:
-            nb_device = self.nb.dcim.devices.get(name=device['hostname'])
-            nb_interfaces = self.get_netbox_interfaces(nb_device)
-            for interface in device['interfaces']:
-                nb_interface = self._is_this_interfaces_in_netbox(interface, nb_interfaces)
-                if nb_interface is None:  # interface doesn't exist, need to create it
-                    interface['device'] = nb_device.id
-                    try:
-                        logging.info(f"create {device['hostname']} {interface['name']}")
-                        new_interface = self.nb.dcim.interfaces.create(**interface)
-                    except pynetbox.core.query.RequestError as e:
-                        logging.warning(f"{e} - {device['hostname']} {interface['name']}")
-                else:  # interface exists, need to update it
-                    try:
-                        logging.info(f"update {device['hostname']} {interface['name']}")
-                        update_interface = nb_interface.update(interface)
-                    except pynetbox.core.query.RequestError as e:
-                        logging.warning(f"{e} - {device['hostname']} {interface['name']}")
-
-    def result_message(self, data) -> str:
-        """ Prepare final message, based on show diff """
+    def result_message(self, changesets) -> str:
+        """ Prepare final message, based on device changesets """
         result = "Summary: "
         total_edits = 0
         outputs = str()
-        for device in data:
-            total_edits += len(device['create_interfaces'])
-            total_edits += len(device['update_interfaces'])
+        for changeset in changesets:
+            total_edits += len(changeset.create)
+            total_edits += len(changeset.update)
             outputs += (
-                f"{device['hostname']} interfaces {len(device['create_interfaces'])} created,"
-                f"{len(device['update_interfaces'])} updated\n"
+                f"{changeset.hostname} interfaces {len(changeset.create)} created,"
+                f"{len(changeset.update)} updated\n"
             )
         if total_edits == 0:
             return result + "Nothing to do."
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+
+from connectors.netbox_scheduler import parse_retry_after
+
+try:
+    import aiohttp
+except ImportError:  # async backend is optional, NB falls back to sync pynetbox backend without it
+    aiohttp = None
+
+DEFAULT_CONCURRENCY = 8  # simultaneous requests, keep it below NetBox worker count
+KEEPALIVE_TIMEOUT = 30  # seconds
+
+
+class AsyncNetBoxError(Exception):
+    """ NetBox rejected the request """
+    def __init__(self, status, error, retry_after=None):
+        self.status = status
+        self.error = error
+        self.retry_after = retry_after  # seconds from Retry-After header
+        super().__init__(f"The request failed with code {status}: {error}")
+
+
+# request failures which are left after retries, a failed bulk write is retried item by item on them
+REQUEST_ERRORS = (AsyncNetBoxError,) if aiohttp is None else (AsyncNetBoxError, aiohttp.ClientError)
+
+
+class AsyncNetBoxClient:
+    """
+        asyncio NetBox REST API client
+
+        All requests share one keep-alive connection pool,
+        at most 'concurrency' requests are sent to NetBox at the same time.
+        If scheduler (netbox_scheduler.RequestScheduler) is set, requests are paced,
+        retried and limited by its adaptive concurrency too.
+        Usage:
+            async with AsyncNetBoxClient(address, token) as client:
+                devices = await client.get_all('dcim/devices/', {'name': ['sw1', 'sw2']})
+    """
+    def __init__(
+        self, address, token, concurrency=DEFAULT_CONCURRENCY, verify=True, page_size=1000, metrics=None, scheduler=None
+    ):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is required for async NetBox backend, install it with 'pip install aiohttp'")
+        self.url = f"{address.rstrip('/')}/api/"
+        self.headers = {
+            'Authorization': f"Token {token}",
+            'Accept': 'application/json',
+        }
+        self.concurrency = concurrency
+        self.verify = verify
+        self.page_size = page_size
+        self.metrics = metrics
+        self.scheduler = scheduler
+        self.session = None
+        self.semaphore = None
+        self.condition = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ssl=None if self.verify else False,
+        )
+        self.session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.condition = asyncio.Condition()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    @staticmethod
+    def _query(params) -> list[tuple]:
+        """ Convert filter dict to query, list values become repeated parameters like in pynetbox """
+        query = list()
+        for key, value in params.items():
+            if isinstance(value, (list, tuple, set)):
+                query.extend((key, str(item)) for item in value)
+            else:
+                query.append((key, str(value)))
+        return query
+
+    async def request(self, method, path, params=None, json=None):
+        """ Send request and return decoded JSON body, retry it if scheduler allows """
+        attempt = 0
+        while True:
+            try:
+                return await self._send(method, path, params, json)
+            except AsyncNetBoxError as e:
+                if self.scheduler is None or not self.scheduler.should_retry(method, e.status, attempt):
+                    raise
+                delay = self.scheduler.retry_delay(attempt, e.retry_after)
+                status = e.status
+            except aiohttp.ClientConnectionError:
+                if self.scheduler is None or not self.scheduler.should_retry(method, None, attempt):
+                    raise
+                delay = self.scheduler.retry_delay(attempt)
+                status = 'connection error'
+            logging.warning(f"NetBox {method} {path} failed with {status}, retry in {delay:.2f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _send(self, method, path, params=None, json=None):
+        if self.scheduler is not None:
+            await asyncio.sleep(self.scheduler.reserve())
+        async with self.semaphore:
+            if self.scheduler is not None:
+                async with self.condition:
+                    await self.condition.wait_for(self.scheduler.try_acquire)
+            start = time.perf_counter()
+            status = None
+            try:
+                async with self.session.request(
+                    method, self.url + path, params=self._query(params or {}), json=json
+                ) as response:
+                    status = response.status
+                    if self.metrics is not None:
+                        self.metrics.add_request(method, self.url + path, response.status, time.perf_counter() - start)
+                    if response.status >= 400:
+                        raise AsyncNetBoxError(
+                            response.status, await self._error(response),
+                            parse_retry_after(response.headers.get('Retry-After')),
+                        )
+                    return await response.json(content_type=None) if response.content_length != 0 else None
+            finally:
+                if self.scheduler is not None:
+                    self.scheduler.release(time.perf_counter() - start, status)
+                    async with self.condition:
+                        self.condition.notify_all()
+
+    @staticmethod
+    async def _error(response):
+        """ Error body of failed request, proxy error pages (502/503/504 from nginx) aren't JSON """
+        try:
+            return await response.json(content_type=None)
+        except ValueError:
+            return await response.text(errors='replace')
+
+    async def get_all(self, path, params) -> list[dict]:
+        """ Get all objects matching filter, pages after the first one are requested concurrently """
+        params = dict(params, limit=self.page_size, offset=0)
+        first_page = await self.request('GET', path, params=params)
+        results = list(first_page['results'])
+        if first_page.get('next') is None:
+            return results
+        pages = await asyncio.gather(*(
+            self.request('GET', path, params=dict(params, offset=offset))
+            for offset in range(self.page_size, first_page['count'], self.page_size)
+        ))
+        for page in pages:
+            results.extend(page['results'])
+        logging.debug(f"GET {path} {len(results)} objects in {len(pages) + 1} pages")
+        return results
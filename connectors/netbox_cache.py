@@ -0,0 +1,66 @@
+from functools import lru_cache
+
+
+@lru_cache(maxsize=65536)
+def normalize_interface_name(name) -> str:
+    """ Interface name used for matching, ex. 'GigabitEthernet 1/0/1' -> 'gigabitethernet1/0/1' """
+    return name.lower().replace(" ", "")
+
+
+class NetBoxCache:
+    """
+        Run-scoped snapshot of NetBox devices and their interfaces
+
+        Devices are stored by hostname, interfaces by device id.
+        A hostname stored with None value means the device doesn't exist in NetBox,
+        so it isn't requested again during the run.
+        Every device interfaces list has an index by normalized interface name.
+    """
+    def __init__(self):
+        self.devices = dict()
+        self.interfaces = dict()
+        self.indexes = dict()
+
+    def clear(self):
+        """ Forget everything, used before every run of a long-running process """
+        self.devices.clear()
+        self.interfaces.clear()
+        self.indexes.clear()
+
+    def has_device(self, hostname) -> bool:
+        return hostname in self.devices
+
+    def get_device(self, hostname):
+        return self.devices.get(hostname)
+
+    def set_device(self, hostname, device):
+        self.devices[hostname] = device
+
+    def remove_device(self, hostname):
+        """ Forget device and its interfaces, used when device is processed and won't be needed again """
+        device = self.devices.pop(hostname, None)
+        if device is not None:
+            self.interfaces.pop(device.id, None)
+            self.indexes.pop(device.id, None)
+
+    def has_interfaces(self, device_id) -> bool:
+        return device_id in self.interfaces
+
+    def get_interfaces(self, device_id) -> list:
+        return self.interfaces[device_id]
+
+    def get_interfaces_index(self, device_id) -> dict:
+        return self.indexes[device_id]
+
+    def set_interfaces(self, device_id, interfaces):
+        self.interfaces[device_id] = list(interfaces)
+        index = dict()
+        for interface in self.interfaces[device_id]:
+            index.setdefault(normalize_interface_name(interface.name), interface)  # first match wins
+        self.indexes[device_id] = index
+
+    def add_interface(self, device_id, interface):
+        """ Keep snapshot consistent after interface was created in NetBox """
+        if device_id in self.interfaces:
+            self.interfaces[device_id].append(interface)
+            self.indexes[device_id].setdefault(normalize_interface_name(interface.name), interface)
@@ -0,0 +1,151 @@
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+RETRYABLE_STATUSES = frozenset({429, 502, 503, 504})
+NOT_PROCESSED_STATUSES = frozenset({429, 503})  # NetBox didn't process the request, safe to send POST again
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'PATCH', 'DELETE'})
+DEFAULT_RETRIES = 3
+LATENCY_TOLERANCE = 2.0  # latency above baseline * tolerance means NetBox is overloaded
+LATENCY_WEIGHT = 0.2  # weight of the last response in average latency
+
+
+def parse_retry_after(value):
+    """ Retry-After header in seconds, it may be a number of seconds or HTTP date, None if missing or invalid """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """
+        Pacing, retries and adaptive concurrency of NetBox requests, shared by sync and async clients
+
+        rate - requests per second for all clients together, None - unlimited.
+        Retryable responses (429, 502, 503, 504) and connection errors are retried up to 'retries' times
+        with exponential backoff and full jitter, Retry-After header pauses all requests.
+        POST is retried only if NetBox didn't process it (429, 503), so interfaces aren't created twice.
+        Concurrency limit starts at max_concurrency, halves when average latency exceeds
+        LATENCY_TOLERANCE times the baseline or NetBox asks to slow down,
+        and grows back by one after 'limit' successful requests.
+    """
+    def __init__(self, rate=None, retries=DEFAULT_RETRIES, backoff=0.5, max_backoff=30.0, max_concurrency=1):
+        self.condition = threading.Condition()
+        self.interval = 1 / rate if rate else 0.0
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.next_slot = 0.0
+        self.paused_until = 0.0
+        self.latency = None  # average latency, seconds
+        self.baseline = None  # latency of not loaded NetBox
+        self.decreased_at = 0.0
+
+    def reserve(self) -> float:
+        """ Delay before the next request may be sent, counts rate limit and Retry-After pause """
+        with self.condition:
+            now = time.monotonic()
+            slot = max(now, self.next_slot, self.paused_until)
+            self.next_slot = slot + self.interval
+            return slot - now
+
+    def try_acquire(self) -> bool:
+        """ Take concurrency slot if the current limit allows """
+        with self.condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        """ Wait for concurrency slot, for threads """
+        with self.condition:
+            self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    def release(self, seconds, status=None):
+        """ Free concurrency slot and adapt the limit, status None - connection error """
+        with self.condition:
+            self.in_flight -= 1
+            self._adapt(seconds, status)
+            self.condition.notify_all()
+
+    def _adapt(self, seconds, status):
+        overloaded = status is None or status in RETRYABLE_STATUSES
+        if not overloaded:
+            if self.latency is None:
+                self.latency = self.baseline = seconds
+            else:
+                self.latency += (seconds - self.latency) * LATENCY_WEIGHT
+                self.baseline += (min(self.latency, self.baseline) - self.baseline) * LATENCY_WEIGHT
+            overloaded = self.latency > self.baseline * LATENCY_TOLERANCE
+        now = time.monotonic()
+        if not overloaded:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        elif now - self.decreased_at > (self.latency or seconds):  # once per round trip, not for every slow response
+            self.limit = max(1.0, self.limit / 2)
+            self.decreased_at = now
+            logging.info(f"NetBox is overloaded, concurrency limit is {int(self.limit)}")
+
+    def should_retry(self, method, status, attempt) -> bool:
+        """ status None - connection error """
+        if attempt >= self.retries:
+            return False
+        if status in NOT_PROCESSED_STATUSES:
+            return True
+        return (status is None or status in RETRYABLE_STATUSES) and method.upper() in IDEMPOTENT_METHODS
+
+    def retry_delay(self, attempt, retry_after=None) -> float:
+        """ Delay before retry number 'attempt' from 0, Retry-After pauses all requests """
+        if retry_after is not None:
+            with self.condition:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            return retry_after
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+class ScheduledSession(requests.Session):
+    """ requests.Session for pynetbox, every request is paced and retried by RequestScheduler """
+    def __init__(self, scheduler):
+        super().__init__()
+        self.scheduler = scheduler
+
+    def send(self, request, **kwargs):
+        attempt = 0
+        while True:
+            time.sleep(self.scheduler.reserve())
+            self.scheduler.acquire()
+            start = time.perf_counter()
+            response = None
+            try:
+                response = super().send(request, **kwargs)
+            except requests.exceptions.ConnectionError:
+                if not self.scheduler.should_retry(request.method, None, attempt):
+                    raise
+            finally:
+                self.scheduler.release(time.perf_counter() - start, response.status_code if response is not None else None)
+            status = response.status_code if response is not None else None
+            if response is not None and not self.scheduler.should_retry(request.method, status, attempt):
+                return response
+            retry_after = parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+            delay = self.scheduler.retry_delay(attempt, retry_after)
+            logging.warning(
+                f"NetBox {request.method} {request.path_url} failed with {status or 'connection error'}, "
+                f"retry in {delay:.2f}s"
+            )
+            attempt += 1
+            time.sleep(delay)
@@ -0,0 +1,31 @@
+import re
+import threading
+
+import textfsm
+
+ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+_local = threading.local()  # TextFSM parsers keep state while parsing, so they are cached per thread
+
+
+def strip_ansi(s) -> str:
+    """Remove the ANSI escape sequences from a string"""
+    return ANSI_ESCAPE.sub('', s)
+
+
+def _textfsm_parser(template) -> textfsm.TextFSM:
+    """ Compiled template, it is read and compiled once per thread """
+    parsers = _local.__dict__.setdefault('parsers', dict())
+    template = str(template)
+    if template not in parsers:
+        with open(template) as f:
+            parsers[template] = textfsm.TextFSM(f)
+    return parsers[template]
+
+
+def parse_textfsm(raw_output, template) -> list[dict]:
+    """ Parse CLI output with TextFSM template, keys are lowercase template values like netmiko returns """
+    parser = _textfsm_parser(template)
+    parser.Reset()
+    header = [value.lower() for value in parser.header]
+    return [dict(zip(header, row)) for row in parser.ParseText(raw_output)]
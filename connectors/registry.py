@@ -0,0 +1,78 @@
+import logging
+from importlib import import_module
+from importlib.metadata import entry_points
+
+from connectors.base_connector import BaseConnector, ConnectorError
+
+ENTRY_POINT_GROUP = 'netbox_interfaces.connectors'
+BUILTIN_CONNECTORS = {
+    'eltex': 'connectors.eltex.eltex:Eltex',
+    'juniper': 'connectors.juniper.juniper:Juniper',
+}
+
+
+class UnknownConnectorError(ConnectorError):
+    """ Connector name isn't registered """
+
+
+class ConnectorRegistry:
+    """
+        Connector classes by inventory name, vendor modules are imported on first use
+
+        Targets are classes or 'module:Class' strings. Third-party packages register connectors
+        with entry points of ENTRY_POINT_GROUP group, ex. in pyproject.toml:
+            [project.entry-points."netbox_interfaces.connectors"]
+            arista = "netbox_interfaces_arista:Arista"
+        Entry points are scanned only when a name isn't found among registered connectors.
+    """
+    def __init__(self, targets=None):
+        self.targets = dict(BUILTIN_CONNECTORS if targets is None else targets)
+        self.classes = dict()
+        self.entry_points_loaded = False
+
+    def register(self, name, target):
+        """ Add or replace connector, target is a class or 'module:Class' string """
+        self.targets[name] = target
+        self.classes.pop(name, None)
+
+    def _load_entry_points(self):
+        self.entry_points_loaded = True
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            if entry_point.name in self.targets:
+                logging.warning(f"Connector '{entry_point.name}' from {entry_point.value} is already registered")
+                continue
+            self.targets[entry_point.name] = entry_point
+
+    def names(self) -> list[str]:
+        if not self.entry_points_loaded:
+            self._load_entry_points()
+        return sorted(self.targets)
+
+    @staticmethod
+    def _resolve(target) -> type:
+        if isinstance(target, str):
+            module, _, attribute = target.partition(':')
+            return getattr(import_module(module), attribute)
+        if isinstance(target, type):
+            return target
+        return target.load()  # importlib.metadata.EntryPoint
+
+    def get(self, name) -> type:
+        """ Connector class, its module is imported on the first call """
+        if name not in self.classes:
+            if name not in self.targets and not self.entry_points_loaded:
+                self._load_entry_points()
+            if name not in self.targets:
+                raise UnknownConnectorError(f"Unsupported connector '{name}', available: {', '.join(self.names())}")
+            connector_class = self._resolve(self.targets[name])
+            if not issubclass(connector_class, BaseConnector):
+                raise ConnectorError(f"Connector '{name}' class {connector_class!r} isn't a BaseConnector")
+            self.classes[name] = connector_class
+        return self.classes[name]
+
+    def create(self, name, ip, credentials, options=None, **kwargs) -> BaseConnector:
+        """ options - connector specific arguments by connector name, ex. {'juniper': {'lean': True}} """
+        return self.get(name)(ip, credentials, **kwargs, **(options or {}).get(name, {}))
+
+
+registry = ConnectorRegistry()
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_IDLE_TIMEOUT = 300
+
+
+class SessionPool:
+    """
+        Authenticated device sessions kept between runs of a long-running process
+
+        Sessions are stored by (connector type, ip) and checked out exclusively,
+        a device polled by two threads at once gets a second session.
+        Before reuse a session passes connector health check, dead sessions are reopened.
+        Sessions idle for more than idle_timeout seconds are closed by evict_idle.
+    """
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.idle = dict()  # key -> (connector, session, last used time)
+
+    @staticmethod
+    def _key(connector) -> tuple:
+        return type(connector).__name__, str(connector.ip)
+
+    @staticmethod
+    def _close(connector, session):
+        try:
+            connector.close_session(session)
+        except Exception as e:
+            logging.debug(f"Failed to close session to {connector.ip}: {e}")
+
+    def checkout(self, connector):
+        """ Take idle session of the device or open a new one """
+        with self.lock:
+            pooled = self.idle.pop(self._key(connector), None)
+        if pooled is not None:
+            _, session, _ = pooled
+            try:
+                alive = connector.is_session_alive(session)
+            except Exception:
+                alive = False
+            if alive:
+                logging.info(f"Reuse session to {connector.ip}")
+                return session
+            logging.info(f"Session to {connector.ip} is dead, reconnect")
+            self._close(connector, session)
+        return connector.open_session()
+
+    def checkin(self, connector, session):
+        """ Return healthy session to the pool, extra session of the same device is closed """
+        with self.lock:
+            key = self._key(connector)
+            if key not in self.idle:
+                self.idle[key] = (connector, session, time.monotonic())
+                return
+        self._close(connector, session)
+
+    @contextmanager
+    def session(self, connector):
+        """ Checked out session, it is closed instead of returned to the pool if the block fails """
+        session = self.checkout(connector)
+        try:
+            yield session
+        except Exception:
+            self._close(connector, session)
+            raise
+        self.checkin(connector, session)
+
+    def evict_idle(self) -> int:
+        """ Close sessions idle for more than idle_timeout, returns number of closed sessions """
+        deadline = time.monotonic() - self.idle_timeout
+        with self.lock:
+            expired = [key for key, (_, _, last_used) in self.idle.items() if last_used < deadline]
+            evicted = [self.idle.pop(key) for key in expired]
+        for connector, session, _ in evicted:
+            self._close(connector, session)
+        if evicted:
+            logging.info(f"Closed {len(evicted)} idle sessions")
+        return len(evicted)
+
+    def close(self):
+        """ Close all pooled sessions """
+        with self.lock:
+            pooled = list(self.idle.values())
+            self.idle.clear()
+        for connector, session, _ in pooled:
+            self._close(connector, session)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.idle)
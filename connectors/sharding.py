@@ -0,0 +1,32 @@
+import zlib
+
+
+def shard_key(device, by='hash') -> str:
+    """ Value which decides device shard: IP address or site from inventory """
+    if by == 'site':
+        return device.get('site') or ''
+    return str(device['ip'])
+
+
+def shard_index(device, count, by='hash', within=1) -> int:
+    """
+        Deterministic shard of the device, the same on every host and run unlike built-in hash()
+
+        within - shard count of the devices this split is applied to, ex. --shard-count for --processes.
+        That part of the hash already decided the outer shard and is skipped, otherwise
+        devices of a host shard land in a few process shards when the counts share a factor.
+    """
+    return zlib.crc32(shard_key(device, by).encode()) // within % count
+
+
+def select_shard(inventory, count, index, by='hash') -> list:
+    """ Devices of a single shard """
+    return [device for device in inventory if shard_index(device, count, by) == index]
+
+
+def split_inventory(inventory, count, by='hash', within=1) -> list[list]:
+    """ All shards, some of them may be empty """
+    shards = [list() for _ in range(count)]
+    for device in inventory:
+        shards[shard_index(device, count, by, within)].append(device)
+    return shards
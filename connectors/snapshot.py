@@ -0,0 +1,55 @@
+import gzip
+import json
+from pathlib import Path
+
+
+class SnapshotWriter:
+    """
+        Gzip-compressed JSON lines file with raw device data
+
+        Every line is {"connector": "eltex", "ip": "10.0.0.1", "data": {...}}
+        or {"connector": "eltex", "ip": "10.0.0.1", "error": "..."} for devices which weren't collected.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = gzip.open(self.path, 'wt', encoding='utf-8')
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+    def _write(self, record):
+        self.file.write(json.dumps(record) + '\n')
+
+    def write(self, connector, ip, data):
+        self._write({'connector': connector, 'ip': str(ip), 'data': data})
+
+    def write_error(self, connector, ip, error):
+        self._write({'connector': connector, 'ip': str(ip), 'error': str(error)})
+
+
+def read_snapshot(path):
+    """ Yield snapshot records one by one, the whole file is never loaded """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def raw_path(directory, ip) -> Path:
+    """ File of saved raw device output, ex. '10.0.0.1.json' """
+    return Path(directory).joinpath(f"{str(ip).replace(':', '_')}.json")
+
+
+def save_raw(directory, ip, data):
+    """ Save raw device output (before parsing) for replay """
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    raw_path(directory, ip).write_text(json.dumps(data))
+
+
+def load_raw(directory, ip) -> dict:
+    """ Raw device output saved by save_raw """
+    return json.loads(raw_path(directory, ip).read_text())
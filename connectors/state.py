@@ -0,0 +1,79 @@
+import hashlib
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+
+class StateStore:
+    """
+        Local SQLite store of the last synced state of every device
+
+        For every hostname it keeps a fingerprint of normalized interfaces from device
+        and NetBox interfaces marker (count and last_updated) right after the sync.
+        If both are the same on the next run, the device doesn't need NetBox diff.
+        Change indicators of devices (ex. last commit time) are kept by connector and IP,
+        they are known before the device hostname.
+    """
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS devices (
+                hostname TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                netbox_marker TEXT,
+                synced_at TEXT NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS change_indicators (
+                connector TEXT NOT NULL,
+                ip TEXT NOT NULL,
+                indicator TEXT NOT NULL,
+                synced_at TEXT NOT NULL,
+                PRIMARY KEY (connector, ip)
+            )
+            """
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def fingerprint(interfaces_normalized) -> str:
+        """ Hash of normalized interfaces, doesn't depend on interfaces order """
+        interfaces = sorted(interfaces_normalized['interfaces'], key=lambda interface: interface.name)
+        data = json.dumps([interface.to_dict() for interface in interfaces], sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def is_unchanged(self, hostname, fingerprint, netbox_marker) -> bool:
+        row = self.connection.execute(
+            "SELECT fingerprint, netbox_marker FROM devices WHERE hostname = ?", (hostname,)
+        ).fetchone()
+        return row is not None and row == (fingerprint, netbox_marker)
+
+    def save(self, hostname, fingerprint, netbox_marker):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO devices (hostname, fingerprint, netbox_marker, synced_at) VALUES (?, ?, ?, ?)",
+            (hostname, fingerprint, netbox_marker, datetime.now(timezone.utc).isoformat()),
+        )
+        self.connection.commit()
+
+    def change_indicators(self) -> dict:
+        """ Change indicators of the last successful sync by (connector, ip) """
+        return {
+            (connector, ip): indicator
+            for connector, ip, indicator in self.connection.execute(
+                "SELECT connector, ip, indicator FROM change_indicators"
+            )
+        }
+
+    def save_change_indicator(self, connector, ip, indicator):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO change_indicators (connector, ip, indicator, synced_at) VALUES (?, ?, ?, ?)",
+            (connector, str(ip), indicator, datetime.now(timezone.utc).isoformat()),
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
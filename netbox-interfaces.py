@@ -1,13 +1,23 @@
 import logging
+import os
+import re
+import signal
 import sys
+import threading
 import argparse
+from itertools import chain
 from pathlib import Path
 import csv
 from ipaddress import ip_address, IPv4Address, IPv6Address
 from getpass import getpass
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, as_completed, FIRST_COMPLETED
 
-from connectors.connector_factory import ConnectorFactory
-from connectors.netbox import NB
+from connectors.registry import registry, UnknownConnectorError
+from connectors.state import StateStore
+from connectors.metrics import Metrics, RUN, phase
+from connectors.snapshot import SnapshotWriter, read_snapshot, load_raw, save_raw
+from connectors.session_pool import SessionPool
+from connectors.sharding import select_shard, split_inventory
 
 import json
 
@@ -15,65 +25,432 @@ import json
 def file_type(source):
     """Argparse file type validation"""
     if not Path(source).is_file():
-        logging.error("Inventory file doesn't exist")
+        logging.error(f"File {source} doesn't exist")
         sys.exit()
     else:
         return Path(source)
 
 def read_csv(inventory) -> list[dict[IPv4Address | IPv6Address, str]]:
-    """ Read CSV file and return list of dicts"""
+    """ Read CSV file and return list of dicts, 'site', 'role', 'tags' (separated by ';') and 'hostname' columns are optional """
     result = list()
     with open(inventory) as f:
         reader = csv.DictReader(f)
         for row in reader:
-            result.append(
-                {
-                    'ip': ip_address(row['ip']),
-                    'connector': str(row['connector']).lower().strip()
-                }
-            )
+            device = {
+                'ip': ip_address(row['ip']),
+                'connector': str(row['connector']).lower().strip()
+            }
+            for column in ('site', 'role', 'hostname'):
+                if row.get(column):
+                    device[column] = row[column].strip()
+            if row.get('tags'):
+                device['tags'] = [tag.strip() for tag in row['tags'].split(';') if tag.strip()]
+            result.append(device)
     return result
 
-def main():
-    inventory = read_csv(args.inventory)
-    credentials = {'username': input('login: '), 'password': getpass('password: ')}
-    connector_factory = ConnectorFactory()
-    netbox = NB(insecure=args.insecure)
-    netbox_normalized = list()
+def filter_inventory(inventory) -> list[dict]:
+    """
+        Inventory rows matching --site, --role, --tag and --hostname-regex
+
+        Rows without these columns are kept, they are checked by in_scope after collection.
+    """
+    def _match(device):
+        if args.site and device.get('site') and device['site'] not in args.site:
+            return False
+        if args.role and device.get('role') and device['role'] not in args.role:
+            return False
+        if args.tag and device.get('tags') and not set(args.tag) & set(device['tags']):
+            return False
+        if args.hostname_regex and device.get('hostname') and not args.hostname_regex.search(device['hostname']):
+            return False
+        return True
+
+    return [device for device in inventory if _match(device)]
+
+def device_filters() -> dict:
+    """ NetBox device filters from --site, --role and --tag """
+    filters = {'site': args.site, 'role': args.role, 'tag': args.tag}
+    return {key: value for key, value in filters.items() if value}
 
+def in_scope(netbox, hostname) -> bool:
+    """ Collected device matches --hostname-regex and it is in NetBox with --site, --role and --tag """
+    if args.hostname_regex and not args.hostname_regex.search(hostname):
+        logging.info(f"{hostname} doesn't match --hostname-regex, skipped")
+        return False
+    if not netbox.in_scope(hostname):
+        logging.info(f"{hostname} isn't in NetBox or doesn't match --site, --role, --tag, skipped")
+        return False
+    return True
+
+def load_inventory(netbox=None) -> list[dict]:
+    """ Inventory devices of this host shard, all devices if sharding isn't used """
+    if args.from_netbox:
+        inventory = netbox.get_inventory(hostname_regex=args.hostname_regex)
+    else:
+        inventory = filter_inventory(read_csv(args.inventory))
+    if args.shard_count:
+        inventory = select_shard(inventory, args.shard_count, args.shard_index, args.shard_by)
+        logging.info(f"Shard {args.shard_index}/{args.shard_count}: {len(inventory)} devices")
+    return inventory
+
+class UnsupportedDevice:
+    """ Stands for connector of a device with unknown connector name, the device is reported as failed """
+    def __init__(self, name, ip):
+        self.name = name
+        self.ip = ip
+        self.change_indicator = None
+
+def split_supported(inventory) -> tuple[list[dict], list[tuple]]:
+    """
+        Inventory devices with known connectors and (connector, None, error) of the others,
+        so a wrong inventory row fails only its device. Imports only connectors used in inventory
+    """
+    supported = list()
+    unsupported = list()
     for device in inventory:
-        connector = connector_factory.create_connector(
-            device['connector'], device['ip'], credentials
-        )
-        interfaces = connector.get_interfaces()
+        try:
+            registry.get(device['connector'])
+        except UnknownConnectorError as e:
+            logging.error(f"{e}. IP: {device['ip']}. Check inventory file.")
+            unsupported.append((UnsupportedDevice(device['connector'], device['ip']), None, e))
+            continue
+        supported.append(device)
+    return supported, unsupported
+
+def read_interfaces(connector) -> dict | None:
+    """
+        Get raw interfaces from a single device or from --replay directory, runs in a worker thread.
+        None if the device is skipped by --precheck
+    """
+    with phase(connector.metrics, connector.ip, 'collect'):
+        if args.replay:
+            raw_interfaces = load_raw(args.replay, connector.ip)
+        else:
+            raw_interfaces = connector.get_raw_interfaces()
+    if args.save_raw and raw_interfaces is not None:
+        save_raw(args.save_raw, connector.ip, raw_interfaces)
+    return raw_interfaces
+
+def normalize_interfaces(connector, raw_interfaces) -> dict:
+    """ Parse and normalize raw interfaces of a single device """
+    interfaces = connector.parse_interfaces(raw_interfaces)
+    with phase(connector.metrics, connector.ip, 'normalize'):
         interfaces_normalized = connector.get_interfaces_normalize(interfaces)
-        interfaces_normalized = netbox.not_update_identic_interface_fields(interfaces_normalized)
-        netbox_normalized.append(interfaces_normalized)
-    netbox_normalized = netbox.not_update_identic_devices(netbox_normalized)
+    if connector.metrics is not None:
+        connector.metrics.set_hostname(connector.ip, interfaces_normalized['hostname'])
+    return interfaces_normalized
+
+def collect_interfaces(connector) -> dict | None:
+    """ Get and normalize interfaces from a single device, runs in a worker thread """
+    raw_interfaces = read_interfaces(connector)
+    return normalize_interfaces(connector, raw_interfaces) if raw_interfaces is not None else None
+
+def connector_options() -> dict:
+    """ Connector specific options from command line arguments """
+    return {
+        'juniper': {'lean': args.juniper_lean},
+    }
+
+def create_connectors(
+    inventory, credentials, timeout, metrics=None, session_pool=None, change_indicators=None
+) -> list:
+    """ Create connectors for all inventory devices, change_indicators of the last sync are used by --precheck """
+    options = connector_options()
+    change_indicators = change_indicators or dict()
+    return [
+        registry.create(
+            device['connector'], device['ip'], credentials,
+            timeout=timeout, metrics=metrics, options=options, session_pool=session_pool,
+            precheck=args.precheck,
+            last_change_indicator=change_indicators.get((device['connector'], str(device['ip']))),
+        )
+        for device in inventory
+    ]
+
+def iter_collected(connectors, workers, collect=collect_interfaces):
+    """
+        Collect normalized interfaces from devices concurrently
+        and yield (connector, normalized data, error) as soon as every device is done
+
+        No more than 2 * workers devices are queued at the same time,
+        so memory doesn't depend on inventory size.
+        collect=read_interfaces yields raw data instead of normalized.
+        Devices skipped by --precheck aren't yielded.
+    """
+    connectors = iter(connectors)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = dict()
+        while True:
+            for connector in connectors:
+                futures[executor.submit(collect, connector)] = connector
+                if len(futures) >= 2 * workers:
+                    break
+            if not futures:
+                return
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                connector = futures.pop(future)
+                try:
+                    data = future.result()
+                except Exception as e:  # one broken device must not stop the others
+                    logging.error(f"Failed to collect interfaces from {connector.ip}: {e}")
+                    yield connector, None, e
+                    continue
+                if data is not None:
+                    yield connector, data, None
+
+def collect_shard(shard_args, inventory, credentials, raw=False, change_indicators=None) -> tuple[list[tuple], dict]:
+    """
+        Collect a part of inventory in a child process of --processes
+
+        Returns (connector name, ip, data, error, change indicator) of every collected device
+        and device phase timings if metrics are enabled
+    """
+    global args
+    args = shard_args  # child process may not inherit globals
+    metrics = Metrics() if args.metrics else None
+    connectors = create_connectors(inventory, credentials, args.timeout, metrics, change_indicators=change_indicators)
+    results = [
+        (
+            connector.name, str(connector.ip), data, None if error is None else str(error),
+            connector.change_indicator,
+        )
+        for connector, data, error in iter_collected(
+            connectors, args.workers, collect=read_interfaces if raw else collect_interfaces
+        )
+    ]
+    return results, metrics.device_phases() if metrics is not None else dict()
+
+def iter_sharded(inventory, credentials, metrics=None, raw=False, change_indicators=None):
+    """
+        Collect inventory split into args.processes shards in a process pool,
+        every process polls its devices with args.workers threads.
+        Yields (connector, data, error) like iter_collected as soon as every shard is done.
+    """
+    options = connector_options()
+    shards = split_inventory(inventory, args.processes, args.shard_by, within=args.shard_count or 1)
+    shards = [shard for shard in shards if shard]
+    if not shards:
+        return
+    with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+        futures = {
+            executor.submit(collect_shard, args, shard, credentials, raw, change_indicators): shard for shard in shards
+        }
+        for future in as_completed(futures):
+            try:
+                results, phases = future.result()
+            except Exception as e:  # broken process fails only its devices
+                logging.error(f"Shard of {len(futures[future])} devices failed: {e!r}")
+                results = [
+                    (device['connector'], str(device['ip']), None, repr(e), None) for device in futures[future]
+                ]
+                phases = dict()
+            if metrics is not None:
+                metrics.add_device_phases(phases)
+            for connector_name, ip, data, error, change_indicator in results:
+                connector = registry.create(
+                    connector_name, ip_address(ip), credentials, metrics=metrics, options=options
+                )
+                connector.change_indicator = change_indicator
+                yield connector, data, error
+
+def iter_snapshots(paths, metrics=None):
+    """
+        Parse and normalize devices from snapshot files one by one,
+        yields (connector, normalized data, error) like iter_collected
+    """
+    options = connector_options()
+    credentials = {'username': None, 'password': None}  # devices aren't connected
+    for path in paths:
+        for record in read_snapshot(path):
+            try:
+                connector = registry.create(
+                    record['connector'], ip_address(record['ip']), credentials, metrics=metrics, options=options
+                )
+            except UnknownConnectorError as e:
+                logging.error(f"{e}. IP: {record['ip']}. Check snapshot {path}.")
+                yield UnsupportedDevice(record['connector'], ip_address(record['ip'])), None, e
+                continue
+            if 'error' in record:
+                yield connector, None, record['error']
+                continue
+            try:
+                interfaces_normalized = normalize_interfaces(connector, record['data'])
+            except Exception as e:
+                logging.error(f"Failed to normalize interfaces of {connector.ip} from {path}: {e}")
+                yield connector, None, e
+                continue
+            yield connector, interfaces_normalized, None
+
+def iter_devices(inventory, credentials, metrics=None, session_pool=None, change_indicators=None):
+    """ Normalized devices from inventory devices or from snapshots of 'sync' command """
+    if args.command == 'sync':
+        return iter_snapshots(args.snapshots, metrics)
+    inventory, unsupported = split_supported(inventory)
+    if args.processes:
+        return chain(unsupported, iter_sharded(inventory, credentials, metrics, change_indicators=change_indicators))
+    connectors = create_connectors(inventory, credentials, args.timeout, metrics, session_pool, change_indicators)
+    return chain(unsupported, iter_collected(connectors, args.workers))
+
+def track_change_indicators(devices, change_indicators):
+    """ Pass devices through, remembering (connector, ip, indicator) of collected devices by hostname """
+    for connector, interfaces_normalized, error in devices:
+        if error is None and connector.change_indicator is not None:
+            change_indicators[interfaces_normalized['hostname']] = (
+                connector.name, connector.ip, connector.change_indicator
+            )
+        yield connector, interfaces_normalized, error
+
+def save_change_indicators(state, change_indicators, synced):
+    """ Save change indicators of devices which are in sync with NetBox, --precheck skips them until they change """
+    for hostname in synced:
+        if hostname in change_indicators:
+            state.save_change_indicator(*change_indicators[hostname])
+
+def collect_devices(devices) -> tuple[list[dict], list[dict]]:
+    """
+        Wait for all devices from iter_collected or iter_snapshots
+
+        Returns normalized data of collected devices (in order of completion)
+        and list of failed devices with error message
+    """
+    collected = list()
+    failed = list()
+    for connector, interfaces_normalized, error in devices:
+        if error is None:
+            collected.append(interfaces_normalized)
+        else:
+            failed.append({'ip': str(connector.ip), 'error': str(error)})
+        logging.info(f"Collected {len(collected) + len(failed)} devices")
+    return collected, failed
+
+def is_unchanged(state, netbox, hostname, fingerprint, markers) -> bool:
+    """ Device interfaces and NetBox interfaces are the same as after the last sync, NetBox marker is saved to markers """
+    if args.full:
+        return False
+    markers[hostname] = netbox.get_interfaces_marker(netbox.get_netbox_device(hostname))
+    if state.is_unchanged(hostname, fingerprint, markers[hostname]):
+        logging.info(f"{hostname} hasn't changed since the last sync")
+        return True
+    return False
+
+def save_state(state, netbox, fingerprints, markers, changed, errors):
+    """
+        Save fingerprints of synced devices
+
+        Devices with failed interfaces aren't saved, so they are fully compared on the next run.
+        NetBox marker of devices changed by this run is computed from cached interfaces,
+        which keep last_updated of NetBox write responses.
+    """
+    failed = {error['hostname'] for error in errors}
+    for hostname, fingerprint in fingerprints.items():
+        if hostname in failed:
+            continue
+        if hostname in changed or hostname not in markers:
+            markers[hostname] = netbox.get_interfaces_marker(netbox.get_netbox_device(hostname))
+        state.save(hostname, fingerprint, markers[hostname])
+
+def stream(devices, netbox, state, change_indicators):
+    """
+        Normalize, diff and apply every device as soon as its data arrives from 'devices' iterator
+
+        Only counters are kept between devices and NetBox cache is cleared
+        after every device, so memory stays bounded for any inventory size.
+        Async NetBox backend keeps one event loop and HTTP session for the whole stream.
+    """
+    from connectors.netbox import DeviceNotFoundError  # NB module is imported lazily, see create_netbox
 
-    show_diff = netbox.show_diff(netbox_normalized)
-    print(f"Actions: {json.dumps(show_diff, indent=4)}")
     if args.force:
         print('Add interfaces to Netbox? Y/N: y')
-        netbox.add_interfaces(netbox_normalized)
     else:
         ask_netbox_add = input('Add interfaces to Netbox? Y/N: ')
-        if ask_netbox_add.lower() == 'y':
-            netbox.add_interfaces(netbox_normalized)
-        else:
+        if ask_netbox_add.lower() != 'y':
             print("Exit.")
             sys.exit()
-    print(netbox.result_message(show_diff))
+    total_devices = total_edits = total_errors = total_failed = 0
+    with netbox.async_session():
+        for connector, interfaces_normalized, error in devices:
+            total_devices += 1
+            if error is not None:
+                total_failed += 1
+                print(f"Failed device: {json.dumps({'ip': str(connector.ip), 'error': str(error)})}", flush=True)
+                continue
+            hostname = interfaces_normalized['hostname']
+            if netbox.backend == 'async':
+                netbox.prefetch([hostname])
+            if not in_scope(netbox, hostname):
+                netbox.cache.remove_device(hostname)
+                continue
+            fingerprint = state.fingerprint(interfaces_normalized)
+            markers = dict()
+            try:
+                if is_unchanged(state, netbox, hostname, fingerprint, markers):
+                    save_change_indicators(state, change_indicators, [hostname])
+                    netbox.cache.remove_device(hostname)
+                    continue
+                with phase(netbox.metrics, hostname, 'diff'):
+                    changeset = netbox.diff(interfaces_normalized)
+            except DeviceNotFoundError as e:  # one unknown device must not stop the others
+                total_failed += 1
+                failed_device = {'ip': str(connector.ip), 'hostname': hostname, 'error': str(e)}
+                print(f"Failed device: {json.dumps(failed_device)}", flush=True)
+                netbox.cache.remove_device(hostname)
+                continue
+            changed = set()
+            errors = list()
+            if not changeset.is_empty():
+                print(f"Actions: {json.dumps(changeset.to_dict())}", flush=True)
+                with phase(netbox.metrics, hostname, 'apply'):
+                    errors = netbox.add_interfaces([changeset], bulk_size=args.bulk_size)
+                for interface_error in errors:
+                    print(f"Failed interface: {json.dumps(interface_error)}", flush=True)
+                total_edits += len(changeset.create) + len(changeset.update)
+                total_errors += len(errors)
+                changed.add(hostname)
+            else:
+                logging.info(f"{hostname} doesn't need updating")
+            save_state(state, netbox, {hostname: fingerprint}, markers, changed, errors)
+            if not errors:
+                save_change_indicators(state, change_indicators, [hostname])
+            netbox.cache.remove_device(hostname)
+            logging.info(f"Processed {total_devices} devices")
+    print(
+        f"Summary: {total_devices} devices processed, {total_failed} failed, "
+        f"{total_edits} interfaces changed, {total_errors} interfaces failed"
+    )
 
+def positive_int(value):
+    """Argparse positive integer validation"""
+    try:
+        value = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not an integer")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"'{value}' must be greater than zero")
+    return value
 
-if __name__ == "__main__":
-    logging.basicConfig(
-        level=logging.WARNING,
-        format="{asctime}.{msecs} {levelname} - {message}",
-        style="{",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+def positive_float(value):
+    """Argparse positive number validation"""
+    try:
+        value = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a number")
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"'{value}' must be greater than zero")
+    return value
 
+def non_negative_int(value):
+    """Argparse non-negative integer validation"""
+    try:
+        value = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not an integer")
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"'{value}' must not be negative")
+    return value
+
+def parse_args(argv=None):
+    """ Parse command line arguments, argv=None - sys.argv """
     parser = argparse.ArgumentParser(
         prog='Netbox-Interfaces',
         description='''
@@ -94,11 +471,367 @@ if __name__ == "__main__":
         type=file_type, help='Inventory-file path, ex. /path/local/file.csv',
         default=Path(__file__).resolve(strict=True).parent.joinpath('inventory.csv')
     )
+    parser.add_argument(
+        '--from-netbox',
+        action='store_true',
+        help="Build inventory from NetBox devices with primary IP instead of inventory file, "
+             "connector is chosen by platform from [PLATFORMS] settings section"
+    )
+    parser.add_argument(
+        '--site',
+        action='append', help="Sync only devices of this NetBox site slug, can be repeated"
+    )
+    parser.add_argument(
+        '--role',
+        action='append', help="Sync only devices of this NetBox device role slug, can be repeated"
+    )
+    parser.add_argument(
+        '--tag',
+        action='append', help="Sync only devices with this NetBox tag slug, can be repeated"
+    )
+    parser.add_argument(
+        '--hostname-regex',
+        type=re.compile, help="Sync only devices with hostname matching this regular expression"
+    )
+    parser.add_argument(
+        '-w', '--workers',
+        type=positive_int, default=10, help="Number of devices polled concurrently"
+    )
+    parser.add_argument(
+        '-t', '--timeout',
+        type=positive_int, default=60, help="Per-device connection and command timeout, seconds"
+    )
+    parser.add_argument(
+        '--processes',
+        type=positive_int, help="Split inventory into N shards polled by separate processes, each with --workers threads"
+    )
+    parser.add_argument(
+        '--shard-count',
+        type=positive_int, help="Split inventory into N shards and process only --shard-index one, "
+                                "for running on several hosts"
+    )
+    parser.add_argument(
+        '--shard-index',
+        type=int, default=0, help="Shard of this host, from 0 to --shard-count - 1"
+    )
+    parser.add_argument(
+        '--shard-by',
+        choices=['hash', 'site'], default='hash',
+        help="Split inventory by hash of device IP or by 'site' inventory column"
+    )
+    parser.add_argument(
+        '--juniper-lean',
+        action='store_true',
+        help="Request only needed interface fields from Juniper ('show interfaces brief') instead of full statistics"
+    )
+    parser.add_argument(
+        '--save-raw',
+        type=Path, help="Save raw device output before parsing to this directory, one JSON file per device IP"
+    )
+    parser.add_argument(
+        '--replay',
+        type=Path, help="Parse raw output saved by --save-raw from this directory instead of connecting to devices"
+    )
+    parser.add_argument(
+        '-p', '--prefetch',
+        action='store_true', help="Load NetBox devices and interfaces with bulk requests before diff"
+    )
+    parser.add_argument(
+        '-b', '--bulk-size',
+        type=positive_int, help="Create and update interfaces with list requests of N interfaces"
+    )
+    parser.add_argument(
+        '--netbox-backend',
+        choices=['sync', 'async'], default='sync',
+        help="'async' sends NetBox requests concurrently, requires aiohttp and implies --prefetch"
+    )
+    parser.add_argument(
+        '--netbox-concurrency',
+        type=positive_int, default=8, help="Maximum simultaneous NetBox requests for async backend"
+    )
+    parser.add_argument(
+        '--netbox-rate',
+        type=positive_float, help="Maximum NetBox requests per second, not limited by default"
+    )
+    parser.add_argument(
+        '--netbox-retries',
+        type=non_negative_int, default=3,
+        help="Retries of NetBox requests failed with 429, 502, 503, 504 or connection error, with exponential backoff"
+    )
+    parser.add_argument(
+        '-s', '--stream',
+        action='store_true',
+        help="Diff and push every device to NetBox as soon as it is polled, confirmation is asked once before polling"
+    )
+    parser.add_argument(
+        '--state',
+        type=Path, help="Local state file with fingerprints of synced devices",
+        default=Path(__file__).resolve(strict=True).parent.joinpath('state.sqlite')
+    )
+    parser.add_argument(
+        '--full',
+        action='store_true', help="Compare all devices with NetBox, even if they haven't changed since the last sync"
+    )
+    parser.add_argument(
+        '--precheck',
+        action='store_true',
+        help="Ask devices for a cheap change indicator (ex. last commit) first and skip devices "
+             "which haven't changed since the last successful sync"
+    )
+    parser.add_argument(
+        '--settings',
+        type=file_type, help="Settings file path",
+        default=Path(__file__).resolve(strict=True).parent.joinpath('settings.ini')
+    )
+    parser.add_argument(
+        '-m', '--metrics',
+        type=Path, help="Write run report with per-device phase timings and NetBox requests, "
+                        "JSON or Prometheus textfile if file name ends with '.prom'"
+    )
+    parser.add_argument(
+        '--profile-device',
+        help="Run collection and diff of this device (IP or hostname) under cProfile"
+    )
+    parser.add_argument(
+        '--profile-output',
+        type=Path, default=Path('profile.pstats'), help="cProfile stats file for --profile-device"
+    )
+    parser.add_argument(
+        '-d', '--daemon',
+        action='store_true',
+        help="Keep running and sync every --interval seconds or on SIGUSR1, device sessions are reused between runs. "
+             "Requires --force"
+    )
+    parser.add_argument(
+        '--interval',
+        type=positive_int, default=300, help="Seconds between runs in daemon mode"
+    )
+    parser.add_argument(
+        '--idle-timeout',
+        type=positive_int, default=900, help="Close device sessions unused for this number of seconds in daemon mode"
+    )
     parser.add_argument(
         '-l', '--logging',
         choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], default='WARNING'
     )
-    args = parser.parse_args()
+    subparsers = parser.add_subparsers(
+        dest='command', metavar='command',
+        help="Without command devices are polled and synced with NetBox in one run"
+    )
+    collect_parser = subparsers.add_parser(
+        'collect', help="Poll inventory devices and save their raw output to snapshot file, NetBox isn't used"
+    )
+    collect_parser.add_argument(
+        'snapshot',
+        type=Path, help="Snapshot file path, gzip-compressed JSON lines, ex. snapshot.jsonl.gz"
+    )
+    sync_parser = subparsers.add_parser(
+        'sync', help="Normalize devices from snapshot files and sync them with NetBox, devices aren't connected"
+    )
+    sync_parser.add_argument(
+        'snapshots',
+        type=file_type, nargs='+', help="Snapshot files made by 'collect' command"
+    )
+    parsed_args = parser.parse_args(argv)
+    if parsed_args.daemon and not parsed_args.force:
+        parser.error("--daemon requires --force, changes can't be confirmed interactively")
+    if parsed_args.daemon and parsed_args.command == 'collect':
+        parser.error("--daemon can't be used with 'collect' command")
+    if parsed_args.daemon and parsed_args.processes:
+        parser.error("--daemon can't be used with --processes, device sessions can't be shared between processes")
+    if parsed_args.precheck and (parsed_args.command is not None or parsed_args.replay):
+        parser.error("--precheck can't be used with 'collect', 'sync' or --replay, devices must be connected")
+    if parsed_args.shard_count and not 0 <= parsed_args.shard_index < parsed_args.shard_count:
+        parser.error("--shard-index must be from 0 to --shard-count - 1")
+    return parsed_args
+
+def get_credentials() -> dict:
+    """ Device credentials from environment variables or interactive input """
+    username = os.environ.get('NETBOX_INTERFACES_USERNAME')
+    password = os.environ.get('NETBOX_INTERFACES_PASSWORD')
+    if username is None or password is None:
+        return {'username': input('login: '), 'password': getpass('password: ')}
+    return {'username': username, 'password': password}
+
+def batch(devices, netbox, state, change_indicators):
+    """ Collect all devices from 'devices' iterator, show the whole diff and apply it after confirmation """
+    from connectors.netbox import DeviceNotFoundError  # NB module is imported lazily, see create_netbox
+
+    changesets = list()
+    fingerprints = dict()
+    markers = dict()
+    unchanged = list()
+
+    collected, failed = collect_devices(devices)
+    if args.prefetch or args.netbox_backend == 'async':
+        with phase(netbox.metrics, RUN, 'prefetch'):
+            netbox.prefetch([device['hostname'] for device in collected])
+    for interfaces_normalized in collected:
+        hostname = interfaces_normalized['hostname']
+        if not in_scope(netbox, hostname):
+            continue
+        fingerprint = state.fingerprint(interfaces_normalized)
+        try:
+            if is_unchanged(state, netbox, hostname, fingerprint, markers):
+                unchanged.append(hostname)
+                continue
+            with phase(netbox.metrics, hostname, 'diff'):
+                changeset = netbox.diff(interfaces_normalized)
+        except DeviceNotFoundError as e:
+            failed.append({'hostname': hostname, 'error': str(e)})
+            continue
+        fingerprints[hostname] = fingerprint
+        if changeset.is_empty():
+            logging.info(f"{hostname} doesn't need updating")
+            continue
+        changesets.append(changeset)
+
+    print(f"Actions: {json.dumps([changeset.to_dict() for changeset in changesets], indent=4)}")
+    if failed:
+        print(f"Failed devices: {json.dumps(failed, indent=4)}")
+    if args.force:
+        print('Add interfaces to Netbox? Y/N: y')
+    elif input('Add interfaces to Netbox? Y/N: ').lower() != 'y':
+        print("Exit.")
+        sys.exit()
+    with phase(netbox.metrics, RUN, 'apply'):
+        errors = netbox.add_interfaces(changesets, bulk_size=args.bulk_size)
+    with phase(netbox.metrics, RUN, 'save_state'):
+        save_state(
+            state, netbox, fingerprints, markers, {changeset.hostname for changeset in changesets}, errors
+        )
+        failed_hostnames = {error['hostname'] for error in errors}
+        synced = unchanged + [hostname for hostname in fingerprints if hostname not in failed_hostnames]
+        save_change_indicators(state, change_indicators, synced)
+    print(netbox.result_message(changesets))
+    if errors:
+        print(f"Failed interfaces: {json.dumps(errors, indent=4)}")
+
+def write_metrics(metrics):
+    if args.metrics:
+        metrics.write(args.metrics)
+    if args.profile_device:
+        metrics.dump_profile(args.profile_output)
+
+def collect(inventory, credentials, metrics):
+    """ 'collect' command: save raw interfaces of inventory devices to snapshot file without NetBox """
+    supported, unsupported = split_supported(inventory)
+    if args.processes:
+        devices = chain(unsupported, iter_sharded(supported, credentials, metrics, raw=True))
+    else:
+        connectors = create_connectors(supported, credentials, args.timeout, metrics)
+        devices = chain(unsupported, iter_collected(connectors, args.workers, collect=read_interfaces))
+    total_collected = total_failed = 0
+    with SnapshotWriter(args.snapshot) as snapshot:
+        for connector, raw_interfaces, error in devices:
+            if error is None:
+                snapshot.write(connector.name, connector.ip, raw_interfaces)
+                total_collected += 1
+            else:
+                snapshot.write_error(connector.name, connector.ip, error)
+                total_failed += 1
+                print(f"Failed device: {json.dumps({'ip': str(connector.ip), 'error': str(error)})}", flush=True)
+            logging.info(f"Collected {total_collected + total_failed}/{len(inventory)} devices")
+    print(f"Summary: {total_collected} devices collected, {total_failed} failed, snapshot {args.snapshot}")
+
+def run(inventory, credentials, netbox, state, session_pool=None):
+    """ Single sync of all inventory devices or snapshots """
+    last_change_indicators = state.change_indicators() if args.precheck and not args.full else None
+    change_indicators = dict()
+    devices = track_change_indicators(
+        iter_devices(inventory, credentials, netbox.metrics, session_pool, last_change_indicators), change_indicators
+    )
+    with netbox.metrics.phase(RUN, 'total'):
+        if args.stream:
+            stream(devices, netbox, state, change_indicators)
+        else:
+            batch(devices, netbox, state, change_indicators)
+    write_metrics(netbox.metrics)
+
+def daemon(credentials, netbox, state):
+    """
+        Sync every args.interval seconds or when SIGUSR1 is received, until SIGTERM or SIGINT
+
+        Device sessions are kept in a pool between runs,
+        inventory file (or snapshots for 'sync' command) is read again before every run.
+        A failed run is logged and doesn't stop the daemon.
+    """
+    session_pool = SessionPool(idle_timeout=args.idle_timeout)
+    wakeup = threading.Event()
+    stopping = threading.Event()
+
+    def _wakeup(signum, frame):
+        wakeup.set()
+
+    def _stop(signum, frame):
+        stopping.set()
+        wakeup.set()
+
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, _wakeup)
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        while not stopping.is_set():
+            wakeup.clear()
+            netbox.cache.clear()  # NetBox may be changed by others between runs
+            netbox.metrics.reset()  # every report describes a single run
+            try:
+                inventory = load_inventory(netbox) if args.command != 'sync' else None
+                run(inventory, credentials, netbox, state, session_pool)
+            except (Exception, SystemExit) as e:  # NetBox lookups exit on errors in a single run
+                logging.error(f"Run failed: {e!r}")
+            wakeup.wait(args.interval)
+            session_pool.evict_idle()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session_pool.close()
+
+def create_netbox(metrics):
+    from connectors.netbox import NB  # pynetbox and aiohttp aren't imported for --help and 'collect'
+
+    return NB(
+        insecure=args.insecure,
+        backend=args.netbox_backend,
+        concurrency=args.netbox_concurrency,
+        settings=args.settings,
+        metrics=metrics,
+        rate=args.netbox_rate,
+        retries=args.netbox_retries,
+        device_filters=device_filters(),
+    )
+
+def main():
+    metrics = Metrics(profile_device=args.profile_device)
+    netbox = None
+    if args.command != 'collect' or args.from_netbox:
+        netbox = create_netbox(metrics)
+    inventory = load_inventory(netbox) if args.command != 'sync' else None
+    if args.replay or args.command == 'sync':
+        credentials = {'username': None, 'password': None}  # devices aren't connected
+    else:
+        credentials = get_credentials()
+    if args.command == 'collect':
+        with metrics.phase(RUN, 'total'):
+            collect(inventory, credentials, metrics)
+        write_metrics(metrics)
+        return
+    state = StateStore(args.state)
+    if args.daemon:
+        daemon(credentials, netbox, state)
+    else:
+        run(inventory, credentials, netbox, state)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="{asctime}.{msecs} {levelname} - {message}",
+        style="{",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    args = parse_args()
 
     logging.getLogger().setLevel(args.logging)
 
@@ -0,0 +1,74 @@
+import pynetbox
+from pynetbox.models.dcim import Interfaces
+
+from connectors.diff import diff_device
+from connectors.interface import InterfaceRecord
+from connectors.netbox_cache import normalize_interface_name
+
+API = pynetbox.api('http://netbox.invalid', token='test')
+
+
+def nb_interface(interface_id, name, **fields):
+    """ Interface record the way pynetbox builds it from NetBox JSON """
+    values = {
+        'id': interface_id,
+        'url': f"http://netbox.invalid/api/dcim/interfaces/{interface_id}/",
+        'display': name,
+        'name': name,
+        'type': {'value': '1000base-t', 'label': '1000BASE-T'},
+        'mode': {'value': 'access', 'label': 'Access'},
+        'enabled': True,
+        'description': 'uplink',
+        'mtu': None,
+        'parent': None,
+        'lag': None,
+    }
+    values.update(fields)
+    return Interfaces(values, API, API.dcim.interfaces)
+
+
+def nested(interface):
+    return {'id': interface.id, 'url': interface.url, 'display': interface.name, 'name': interface.name}
+
+
+def diff(interfaces, nb_interfaces):
+    index = {normalize_interface_name(interface.name): interface for interface in nb_interfaces}
+    return diff_device({'hostname': 'sw1', 'interfaces': interfaces}, None, index)
+
+
+def record(name, **fields):
+    return InterfaceRecord(name, type='1000base-t', mode='access', enabled=True, description='uplink', **fields)
+
+
+def test_matching_interface_is_unchanged():
+    changeset = diff([record('ge-0/0/0')], [nb_interface(1, 'ge-0/0/0')])
+    assert changeset.is_empty()
+    assert changeset.unchanged == ['ge-0/0/0']
+
+
+def test_changed_choice_field():
+    tagged = nb_interface(1, 'ge-0/0/0', mode={'value': 'tagged', 'label': 'Tagged'})
+    changeset = diff([record('ge-0/0/0', mtu=None)], [tagged])
+    assert [interface.changed for interface in changeset.update] == [('mode',)]
+    assert changeset.to_dict()['update_interfaces'] == [{'name': 'ge-0/0/0', 'mode': 'access'}]
+
+
+def test_references_are_compared_by_name():
+    ae0 = nb_interface(1, 'ae0', type={'value': 'lag', 'label': 'LAG'})
+    ae1 = nb_interface(2, 'ae1', type={'value': 'lag', 'label': 'LAG'})
+    member = nb_interface(3, 'ge-0/0/0', lag=nested(ae0))
+    unit = nb_interface(4, 'ge-0/0/0.100', parent=nested(member))
+    changeset = diff(
+        [record('ge-0/0/0', lag='ae1'), record('ge-0/0/0.100', parent='ge-0/0/0')],
+        [ae0, ae1, member, unit],
+    )
+    assert [(interface.name, interface.changed) for interface in changeset.update] == [('ge-0/0/0', ('lag',))]
+    assert changeset.unchanged == ['ge-0/0/0.100']
+
+
+def test_written_values_are_unchanged():
+    interface = nb_interface(1, 'ge-0/0/0', mode={'value': 'tagged', 'label': 'Tagged'})
+    interface.mode = 'access'  # NB._update_cached_interface stores written values as they are
+    interface.lag = 'ae0'
+    changeset = diff([record('ge-0/0/0', lag='ae0')], [interface])
+    assert changeset.is_empty()
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from connectors.netbox_async import AsyncNetBoxClient, AsyncNetBoxError
+from connectors.netbox_scheduler import RequestScheduler
+
+web = pytest.importorskip('aiohttp.web')
+
+PROXY_ERROR = '<html><head><title>502 Bad Gateway</title></head><body><center>nginx</center></body></html>'
+
+
+async def serve(replies, test):
+    """ Run test(client) against local NetBox replying with (status, headers, body) one by one """
+    sent = list()
+
+    async def handler(request):
+        sent.append(request.method)
+        status, headers, body = replies.pop(0)
+        if isinstance(body, str):
+            return web.Response(status=status, headers=headers, text=body, content_type='text/html')
+        return web.json_response(body, status=status, headers=headers)
+
+    app = web.Application()
+    app.router.add_route('*', '/api/dcim/interfaces/', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    scheduler = RequestScheduler(retries=2, backoff=0.01)
+    try:
+        async with AsyncNetBoxClient(f"http://127.0.0.1:{port}", 'token', scheduler=scheduler) as client:
+            return await test(client), sent
+    finally:
+        await runner.cleanup()
+
+
+def test_proxy_error_page_is_retried():
+    replies = [
+        (502, {'Retry-After': '0.05'}, PROXY_ERROR),
+        (200, {}, {'count': 1, 'next': None, 'results': [{'id': 1}]}),
+    ]
+    results, sent = asyncio.run(serve(replies, lambda client: client.get_all('dcim/interfaces/', {})))
+    assert results == [{'id': 1}]
+    assert sent == ['GET', 'GET']
+
+
+def test_proxy_error_page_raises_netbox_error():
+    replies = [(504, {}, PROXY_ERROR)] * 3 + [(502, {}, PROXY_ERROR)]
+
+    async def test(client):
+        with pytest.raises(AsyncNetBoxError) as error:
+            await client.request('GET', 'dcim/interfaces/')
+        post = await asyncio.gather(client.request('POST', 'dcim/interfaces/', json=[]), return_exceptions=True)
+        return error.value, post[0]
+
+    (error, post), sent = asyncio.run(serve(replies, test))
+    assert error.status == 504 and error.retry_after is None
+    assert 'nginx' in error.error
+    assert isinstance(post, AsyncNetBoxError) and post.status == 502  # POST isn't retried on 502
+    assert sent == ['GET', 'GET', 'GET', 'POST']
@@ -0,0 +1,87 @@
+from email.utils import formatdate
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from connectors import netbox_scheduler
+from connectors.netbox_scheduler import RequestScheduler, ScheduledSession, parse_retry_after
+
+
+class FakeAdapter(BaseAdapter):
+    """ Replies with prepared responses: status code, (status code, headers) or exception """
+    def __init__(self, replies):
+        super().__init__()
+        self.replies = list(replies)
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        self.sent += 1
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        status, headers = reply if isinstance(reply, tuple) else (reply, {})
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """ Delays the session slept for, without sleeping """
+    delays = list()
+    monkeypatch.setattr(netbox_scheduler.time, 'sleep', delays.append)
+    return delays
+
+
+def session(replies, retries=3):
+    scheduler = RequestScheduler(retries=retries, backoff=0.1)
+    session = ScheduledSession(scheduler)
+    session.mount('http://', FakeAdapter(replies))
+    return session
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('2.5') == 2.5
+    assert parse_retry_after('-1') == 0.0
+    assert 0 < parse_retry_after(formatdate(netbox_scheduler.time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+
+def test_retry_after_is_honored(sleeps):
+    netbox = session([(429, {'Retry-After': '1.5'}), 200])
+    response = netbox.get('http://netbox.invalid/api/dcim/interfaces/')
+    assert response.status_code == 200
+    assert netbox.adapters['http://'].sent == 2
+    assert 1.5 in sleeps
+    assert netbox.scheduler.paused_until > 0  # other requests wait too
+
+
+def test_gives_up_after_retries(sleeps):
+    netbox = session([503, 503, 503, 503], retries=2)
+    response = netbox.get('http://netbox.invalid/api/dcim/interfaces/')
+    assert response.status_code == 503
+    assert netbox.adapters['http://'].sent == 3
+    assert all(0 <= delay <= 0.4 for delay in sleeps)  # backoff 0.1 * 2 ** attempt at most
+
+
+def test_post_is_retried_only_if_not_processed(sleeps):
+    netbox = session([502, 200])
+    assert netbox.post('http://netbox.invalid/api/dcim/interfaces/', json={}).status_code == 502
+    netbox = session([429, 201])
+    assert netbox.post('http://netbox.invalid/api/dcim/interfaces/', json={}).status_code == 201
+
+
+def test_connection_error_is_raised_after_retries(sleeps):
+    netbox = session([requests.exceptions.ConnectionError('refused')] * 2, retries=1)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        netbox.get('http://netbox.invalid/api/status/')
+    assert netbox.adapters['http://'].sent == 2
+    assert netbox.scheduler.in_flight == 0
@@ -0,0 +1,69 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from connectors.base_connector import BaseConnector, ConnectorError
+from connectors.registry import ConnectorRegistry, UnknownConnectorError
+
+CREDENTIALS = {'username': 'user', 'password': 'secret'}
+
+
+class Dummy(BaseConnector):
+    name = 'dummy'
+
+    def __init__(self, ip, credentials, flavour=None, **kwargs):
+        super().__init__(ip, credentials, **kwargs)
+        self.flavour = flavour
+
+    def get_interfaces_normalize(self, data) -> dict:
+        return {'hostname': data['hostname'], 'interfaces': list()}
+
+
+def test_unknown_connector():
+    registry = ConnectorRegistry({'dummy': Dummy})
+    with pytest.raises(UnknownConnectorError, match="Unsupported connector 'cisco'"):
+        registry.create('cisco', '10.0.0.1', CREDENTIALS)
+    assert issubclass(UnknownConnectorError, ConnectorError)  # handled like other connector errors
+
+
+def test_create_with_options():
+    registry = ConnectorRegistry({'dummy': Dummy})
+    connector = registry.create('dummy', '10.0.0.1', CREDENTIALS, options={'dummy': {'flavour': 'lean'}}, timeout=5)
+    assert (connector.flavour, connector.timeout, connector.username) == ('lean', 5, 'user')
+
+
+def test_string_target_is_imported_lazily():
+    registry = ConnectorRegistry({'dummy': f"{__name__}:Dummy"})
+    assert registry.classes == dict()
+    assert registry.get('dummy') is Dummy
+
+
+def test_target_must_be_connector():
+    registry = ConnectorRegistry({'dummy': 'pathlib:Path'})
+    with pytest.raises(ConnectorError, match="isn't a BaseConnector"):
+        registry.get('dummy')
+
+
+def test_builtin_vendor_modules_are_not_imported():
+    code = (
+        "import sys; from connectors.registry import registry; registry.names(); "
+        "assert not {'netmiko', 'jnpr.junos', 'connectors.eltex.eltex'} & set(sys.modules)"
+    )
+    subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).resolve().parents[1], check=True)
+
+
+def test_unknown_connector_fails_only_its_device(tmp_path):
+    inventory = tmp_path.joinpath('inventory.csv')
+    inventory.write_text('ip,connector\n10.0.0.1,eltex\n10.0.0.2,cisco\n')
+    result = subprocess.run(
+        [
+            sys.executable, 'netbox-interfaces.py', '-i', str(inventory), '--replay', str(tmp_path),
+            'collect', str(tmp_path.joinpath('snapshot.jsonl.gz')),
+        ],
+        cwd=Path(__file__).resolve().parents[1], capture_output=True, text=True, check=True,
+    )
+    assert "Unsupported connector 'cisco'" in result.stdout  # reported as failed device
+    assert '"ip": "10.0.0.1"' in result.stdout  # other devices are still collected
+    assert 'Summary: 0 devices collected, 2 failed' in result.stdout
@@ -0,0 +1,41 @@
+from ipaddress import ip_address
+
+import pytest
+
+from connectors.sharding import select_shard, shard_index, split_inventory
+
+INVENTORY = [
+    {'ip': ip_address('10.0.0.0') + i, 'connector': 'eltex', 'site': f"site-{i % 3}"} for i in range(100)
+]
+
+
+def test_shard_index_is_deterministic():
+    # crc32 of the IP string, doesn't depend on PYTHONHASHSEED, process or host
+    assert [shard_index(device, 4) for device in INVENTORY[:8]] == [1, 3, 1, 3, 0, 2, 0, 2]
+    assert shard_index({'ip': '10.0.0.1'}, 4) == shard_index({'ip': ip_address('10.0.0.1')}, 4)
+
+
+def test_shards_split_inventory():
+    shards = split_inventory(INVENTORY, 4)
+    assert sorted(device['ip'] for shard in shards for device in shard) == [device['ip'] for device in INVENTORY]
+    assert all(shard for shard in shards)
+    assert [select_shard(INVENTORY, 4, index) for index in range(4)] == shards
+
+
+def test_shard_by_site():
+    shards = split_inventory(INVENTORY, 2, by='site')
+    for shard in shards:
+        sites = {device['site'] for device in shard}
+        assert all(device['site'] not in sites for other in shards if other is not shard for device in other)
+    assert shard_index({'ip': '10.0.0.1'}, 2, by='site') == shard_index({'ip': '10.0.0.2', 'site': ''}, 2, by='site')
+
+
+@pytest.mark.parametrize('shard_count, processes', [(2, 2), (2, 4), (3, 3), (4, 2)])
+def test_process_shards_of_host_shard(shard_count, processes):
+    # process shards must not repeat the host split, or some processes get no devices
+    inventory = [{'ip': ip_address('10.0.0.0') + i} for i in range(1000)]
+    for index in range(shard_count):
+        host_shard = select_shard(inventory, shard_count, index)
+        shards = split_inventory(host_shard, processes, within=shard_count)
+        assert sum(len(shard) for shard in shards) == len(host_shard)
+        assert min(len(shard) for shard in shards) > len(host_shard) / processes / 2
@@ -0,0 +1,39 @@
+from connectors.interface import InterfaceRecord
+from connectors.state import StateStore
+
+
+def normalized(*interfaces):
+    return {'hostname': 'sw1', 'interfaces': list(interfaces)}
+
+
+def test_fingerprint_is_stable():
+    first = normalized(
+        InterfaceRecord('ge-0/0/0', type='1000base-t', enabled=True, description='uplink'),
+        InterfaceRecord('ge-0/0/1', enabled=False),
+    )
+    second = normalized(  # another order of interfaces and of fields
+        InterfaceRecord('ge-0/0/1', enabled=False),
+        InterfaceRecord('ge-0/0/0', description='uplink', enabled=True, type='1000base-t'),
+    )
+    assert StateStore.fingerprint(first) == StateStore.fingerprint(second)
+
+
+def test_fingerprint_changes_with_interfaces():
+    fingerprint = StateStore.fingerprint(normalized(InterfaceRecord('ge-0/0/0', description='uplink')))
+    assert StateStore.fingerprint(normalized(InterfaceRecord('ge-0/0/0', description='downlink'))) != fingerprint
+    assert StateStore.fingerprint(normalized(InterfaceRecord('ge-0/0/0'))) != fingerprint  # unset isn't empty
+    assert StateStore.fingerprint(normalized(InterfaceRecord('ge-0/0/1', description='uplink'))) != fingerprint
+
+
+def test_saved_state(tmp_path):
+    state = StateStore(tmp_path.joinpath('state.sqlite'))
+    state.save('sw1', 'fingerprint', '10:2026-01-01')
+    state.save_change_indicator('juniper', '10.0.0.1', 'commit')
+    state.close()
+
+    state = StateStore(tmp_path.joinpath('state.sqlite'))
+    assert state.is_unchanged('sw1', 'fingerprint', '10:2026-01-01')
+    assert not state.is_unchanged('sw1', 'fingerprint', '11:2026-01-02')
+    assert not state.is_unchanged('sw2', 'fingerprint', '10:2026-01-01')
+    assert state.change_indicators() == {('juniper', '10.0.0.1'): 'commit'}
+    state.close()